@@ -1,22 +1,240 @@
 # coding=utf-8
+import collections
+import time
+
+import numpy as np
 from twisted.words.protocols import irc
-from twisted.internet import reactor, protocol
-from Minesweeper_tdd import Game
+from twisted.internet import reactor, protocol, task
+from Minesweeper_tdd import Game, Board
+
+# Games nobody has played for this many seconds are closed
+SESSION_IDLE_TIMEOUT = 30 * 60
+# Games kept open at once, the least recently played one is closed to make room past it
+MAX_SESSIONS = 10000
+# Seconds between sweeps for idle games, and the most games one sweep closes before it lets the reactor go on
+SWEEP_INTERVAL = 60
+SWEEP_LIMIT = 1000
+
+# Lines per second, and lines sent in a burst, that the bot sends to one person and to the server in all
+TARGET_LINE_RATE = 1.0
+TARGET_LINE_BURST = 8
+SERVER_LINE_RATE = 2.0
+SERVER_LINE_BURST = 10
+# Longest line that queued messages are merged into
+MAX_MERGED_LENGTH = 400
+
+HELP_MESSAGE = ("Say 'start' to start a game.\n"
+                "While playing, say 'delta' to only be sent the tiles that changed after each move, "
+                "and 'sync' to be sent the whole board again.")
+
+
+class SessionStore(object):
+    # The games in progress, by user, in the order they were last played.
+    #
+    # Looking a game up with store[user] counts as playing it. Since the least recently played games come
+    # first, a sweep only looks at the games it closes and the one after them, and closing the least
+    # recently played game to make room is just as cheap.
+    def __init__(self, maxSessions=MAX_SESSIONS, idleTimeout=SESSION_IDLE_TIMEOUT, clock=time.time):
+        self.maxSessions = maxSessions
+        self.idleTimeout = idleTimeout
+        self.clock = clock
+        self.sessions = collections.OrderedDict()  # user: (session, time it was last played)
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, user):
+        return user in self.sessions
+
+    has_key = __contains__
+
+    def __getitem__(self, user):
+        session, lastPlayed = self.sessions.pop(user)
+        self.sessions[user] = (session, self.clock())
+        return session
+
+    def __setitem__(self, user, session):
+        self.sessions.pop(user, None)
+        self.sessions[user] = (session, self.clock())
+        while len(self.sessions) > self.maxSessions:
+            self.evict(next(iter(self.sessions)))
+
+    def pop(self, user, *default):
+        if user in self.sessions:
+            return self.sessions.pop(user)[0]
+        if default:
+            return default[0]
+        raise KeyError(user)
+
+    def evict(self, user):
+        session, lastPlayed = self.sessions.pop(user)
+        self.evicted += 1
+        session.evicted()
+
+    def sweep(self, limit=SWEEP_LIMIT):
+        # Closes up to limit games that have been idle for longer than the timeout and returns how many it closed
+        cutoff = self.clock() - self.idleTimeout
+        evicted = 0
+        while self.sessions and evicted < limit:
+            user, (session, lastPlayed) = next(self.sessions.iteritems())
+            if lastPlayed > cutoff:
+                break
+            self.evict(user)
+            evicted += 1
+        if evicted:
+            print "Closed %d idle games, %d closed in all, %d open." % (evicted, self.evicted, len(self))
+        return evicted
+
+    def start_sweeping(self, interval=SWEEP_INTERVAL):
+        sweeper = task.LoopingCall(self.sweep)
+        sweeper.start(interval, now=False)
+        return sweeper
+
+
+class TokenBucket(object):
+    # Allows rate tokens a second, saving up to burst of them
+    def __init__(self, rate, burst, clock=time.time):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.lastRefill = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.lastRefill) * self.rate)
+        self.lastRefill = now
+
+    def is_full(self):
+        self.refill()
+        return self.tokens >= self.burst
+
+    def wait_time(self):
+        # Seconds until a token is available
+        self.refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self):
+        self.refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class OutboundQueue(object):
+    # Holds the bot's messages and sends them line by line as fast as a token bucket for each target and one
+    # for the whole server allow, taking turns between targets.
+    #
+    # Messages waiting for the same target are merged into as few lines as fit MAX_MERGED_LENGTH. Boards are
+    # never merged since their lines have to stay lined up, and a board nobody has started receiving yet is
+    # dropped when a newer board for the same target is queued, since only the latest one matters.
+    def __init__(self, send, clock=time.time, callLater=reactor.callLater):
+        self.send = send  # send(target, line)
+        self.clock = clock
+        self.callLater = callLater
+        self.serverBucket = TokenBucket(SERVER_LINE_RATE, SERVER_LINE_BURST, clock)
+        # target: (bucket, deque of [isBoard, lines, lines sent]), in the order the targets take turns
+        self.targets = collections.OrderedDict()
+        self.scheduledPump = None
+        self.linesSent = 0
+        self.boardsDropped = 0
+
+    def queue(self, target, message, isBoard=False):
+        if target not in self.targets:
+            self.targets[target] = (TokenBucket(TARGET_LINE_RATE, TARGET_LINE_BURST, self.clock),
+                                    collections.deque())
+        lines = [line for line in message.split("\n") if line]
+        if not lines:
+            return
+        entries = self.targets[target][1]
+        if isBoard:
+            for entry in list(entries):
+                if entry[0] and not entry[2]:
+                    entries.remove(entry)
+                    self.boardsDropped += 1
+        entries.append([isBoard, lines, 0])
+        self.pump()
+
+    def next_line(self, entries):
+        # Takes the next line to send from a target's entries, merging the lines of messages that aren't boards
+        entry = entries[0]
+        isBoard, lines, sent = entry
+        if isBoard:
+            line = lines[sent]
+            entry[2] += 1
+            if entry[2] == len(lines):
+                entries.popleft()
+            return line
+        merged = []
+        length = 0
+        while entries and not entries[0][0]:
+            entry = entries[0]
+            lines, sent = entry[1], entry[2]
+            while sent < len(lines):
+                line = lines[sent]
+                if merged and length + len(line) + 3 > MAX_MERGED_LENGTH:
+                    return " | ".join(merged)
+                merged.append(line)
+                length += len(line) + 3
+                sent += 1
+                entry[2] = sent
+            entries.popleft()
+        return " | ".join(merged)
+
+    def pump(self):
+        # Sends every line the buckets allow right now, then comes back when the next one is allowed
+        self.stop()
+        sentLine = True
+        while sentLine and self.targets:
+            sentLine = False
+            for target, (bucket, entries) in list(self.targets.items()):
+                if not entries:
+                    if bucket.is_full():
+                        del self.targets[target]
+                    continue
+                if self.serverBucket.wait_time():
+                    break
+                if not bucket.take():
+                    continue
+                self.serverBucket.take()
+                self.send(target, self.next_line(entries))
+                self.linesSent += 1
+                sentLine = True
+                # Let the other targets go first next time
+                del self.targets[target]
+                self.targets[target] = (bucket, entries)
+        waits = [max(bucket.wait_time(), self.serverBucket.wait_time())
+                 for bucket, entries in self.targets.values() if entries]
+        if waits:
+            self.scheduledPump = self.callLater(min(waits), self.pump)
+
+    def stop(self):
+        if self.scheduledPump is not None and self.scheduledPump.active():
+            self.scheduledPump.cancel()
+        self.scheduledPump = None
 
 
 class GameStateMachine:
-    clients = {}
+    clients = SessionStore()
 
     def __init__(self, user):
         self.user = user
         self.clients[user] = self
         self.state_callback = self.welcome_instructions
         self.game = Game()
+        # Whether only the tiles that changed are sent after a move, and a snapshot of the board as last sent
+        self.deltaUpdates = False
+        self.sentBoard = None
         self.respond("start")
 
     def msg(self, message):
         raise NotImplementedError
 
+    def evicted(self):
+        self.msg("Your game was closed since it wasn't played for a while. Say 'start' to start a new one.")
+
     def error(self, message):
         self.msg("I don't know what you mean by '%s'" % message)
 
@@ -29,7 +247,8 @@ class GameStateMachine:
                 message[0]) in [1, 2, 3]:
             self.setup_board(int(message[0]))
             self.state_callback = self.game_loop
-            self.msg(self.game.show_board())
+            self.sentBoard = None
+            self.send_board()
         else:
             self.error(message)
 
@@ -42,17 +261,61 @@ class GameStateMachine:
             self.game.generate_board(15, 5, 9)
 
     def game_loop(self, message):
+        if message == "delta":
+            self.deltaUpdates = not self.deltaUpdates
+            if self.deltaUpdates:
+                self.msg("You'll only be sent the tiles that change. Say 'sync' to get the whole board.")
+            else:
+                self.msg("You'll be sent the whole board after every move.")
+            return
+        elif message == "sync":
+            self.sentBoard = None
+            self.send_board()
+            return
+
         self.game.process_input(message)
 
         errors = list(self.game.show_errors())
         if len(errors) > 0:
             map(self.msg, errors)
         else:
-            self.msg(self.game.show_board())
+            self.send_board()
 
         if self.game.board.check_end_game_win() or self.game.board.check_end_game_loss():
             self.clients.pop(self.user)
 
+    def send_board(self):
+        # Sends the board, or only the tiles that changed since it was last sent if that was asked for and is
+        # shorter. Changes are sent as plain messages, since a client needs every one of them to keep up.
+        # The board isn't rendered to compare them, every tile takes at least two characters of it.
+        board = self.game.board
+        if self.deltaUpdates and self.sentBoard is not None:
+            delta = self.board_delta(self.sentBoard, board)
+            if len(delta) < 2 * board.width * board.height:
+                self.msg(delta)
+                self.sentBoard = board.copy()
+                return
+        self.msg_board(self.game.show_board())
+        self.sentBoard = board.copy()
+
+    def board_delta(self, old, new):
+        # "Mines Left: n" and the tiles whose symbol differs between the boards, as "column row symbol"
+        changed = np.flatnonzero((old.hiddenGrid != new.hiddenGrid) | (old.flaggedGrid != new.flaggedGrid) |
+                                 (old.mineGrid != new.mineGrid) | (old.nearbyMinesGrid != new.nearbyMinesGrid))
+        tiles = []
+        for index in changed.tolist():
+            symbols = [Board.tile_symbol(b.mineGrid.item(index) == 1, b.hiddenGrid.item(index),
+                                         b.flaggedGrid.item(index), b.nearbyMinesGrid.item(index)).strip()
+                       for b in (old, new)]
+            if symbols[0] != symbols[1]:
+                y, x = divmod(index, new.width)
+                tiles.append("%s %s %s" % (new.label(x), new.label(y), symbols[1] or "_"))
+        return "Mines Left: %d\nChanged: %s" % (self.game.mines - new.number_of_flags,
+                                                  ", ".join(tiles) if tiles else "nothing")
+
+    def msg_board(self, board):
+        self.msg(board)
+
     def respond(self, message):
         self.state_callback(message)
 
@@ -66,6 +329,24 @@ class Bot(irc.IRCClient):
         def msg(self, message):
             self.bot.msg(self.user, message)
 
+        def msg_board(self, board):
+            self.bot.msg_board(self.user, board)
+
+    def connectionMade(self):
+        irc.IRCClient.connectionMade(self)
+        self.outbound = OutboundQueue(lambda target, line: irc.IRCClient.msg(self, target, line))
+
+    def connectionLost(self, reason):
+        self.outbound.stop()
+        irc.IRCClient.connectionLost(self, reason)
+
+    def msg(self, user, message, length=None):
+        # Everything the bot says goes through the outbound queue so it can't flood the server
+        self.outbound.queue(user, message)
+
+    def msg_board(self, user, board):
+        self.outbound.queue(user, board, isBoard=True)
+
     def privmsg(self, user, channel, message):
         user = user.split("!", 1)[0]
         if channel == self.nickname:
@@ -75,7 +356,7 @@ class Bot(irc.IRCClient):
 
     def command(self, user, message):
         if message == "help":
-            self.msg(user, "Say 'start' to start a game.")
+            self.msg(user, HELP_MESSAGE)
         elif self.IRCStateMachine.clients.has_key(user):
             self.IRCStateMachine.clients[user].respond(message)
         elif message == "start":
@@ -129,4 +410,5 @@ if __name__ == "__main__":
     chan = "Minesweepy"
     reactor.connectTCP(host, port,
                        BotFactory("#" + chan, nickname="Minesweepy"))
+    GameStateMachine.clients.start_sweeping()
     reactor.run()
@@ -1,6 +1,7 @@
 #!python3
 import random
 import os
+from collections import OrderedDict
 
 
 class Board:
@@ -20,11 +21,12 @@ class Board:
 
     def __init__(self, sizeX, sizeY, mines, startX, startY, randSeed=None):
         # translate input size into board sizes. (Obviously, you can change this and create custom board sizes.)
-        if sizeX > 0 and sizeX <= 26 and sizeY > 0 and sizeY <= 26:
+        # Boards bigger than the alphabet are addressed with numbers instead of letters.
+        if sizeX > 0 and sizeY > 0:
             self.sizeX = int(sizeX)
             self.sizeY = int(sizeY)
         else:
-            raise ValueError("Invalid board size. Must be between 1 and 26")
+            raise ValueError("Invalid board size. Must be at least 1")
 
         if mines > 0 and mines < (self.sizeX * self.sizeY) / 2:
             self.mines = int(mines)
@@ -38,22 +40,19 @@ class Board:
         # Construct blank boards. Grid contains the value of a cell and visibility contains the state of a cell (hidden, revealed, or flagged)
         self.grid = [[Board._tile.blank for j in range(self.sizeX)] for i in range(self.sizeY)]
         self.visibility = [[Board._tile.hidden for j in range(self.sizeX)] for i in range(self.sizeY)]
-        self.minePositions = []
         self.flags = 0
+        self.hiddenCells = self.sizeX * self.sizeY
+        self._surroundingCoords = Board._buildSurroundingCoordTable(self.sizeX, self.sizeY)
 
         # If a seed is provided, use it.
         if randSeed is not None:
             random.seed(randSeed)
 
-        # calculate mine posotions
-        for i in range(self.mines):
-            xmine = random.randint(0, self.sizeX - 1)
-            ymine = random.randint(0, self.sizeY - 1)
-            while (xmine, ymine) in self.minePositions or (xmine, ymine) == (startX, startY):
-                xmine = random.randint(0, self.sizeX - 1)
-                ymine = random.randint(0, self.sizeY - 1)
-            self.grid[ymine][xmine] = 9
-            self.minePositions.append((xmine, ymine))
+        # calculate mine positions by sampling without replacement from every cell except the starting one
+        excluded = {(startX, startY)}
+        allowed = [(x, y) for y in range(self.sizeY) for x in range(self.sizeX) if (x, y) not in excluded]
+        self.minePositions = set(random.sample(allowed, self.mines))
+        for xmine, ymine in self.minePositions:
             for x, y in self._getSurroundingCoordList(xmine, ymine):
                 self.grid[y][x] += 1
 
@@ -63,11 +62,26 @@ class Board:
 
         self._reveal(startX, startY)
 
+    # Letters label the rows and columns unless the board is too big for them, then numbers starting from 1 do.
+    def _usesNumericLabels(self):
+        return max(self.sizeX, self.sizeY) > len(Board._alphabet)
+
+    def _label(self, n):
+        return str(n + 1) if self._usesNumericLabels() else Board._alphabet[n]
+
+    # Column labels are written downwards, one line per character
+    def _columnMarkers(self):
+        digits = len(self._label(self.sizeX - 1))
+        labels = [self._label(i).rjust(digits) for i in range(self.sizeX)]
+        margin = " " * (len(self._label(self.sizeY - 1)) + 1)
+        return "".join(margin + " ".join(label[place] for label in labels) + "\n" for place in range(digits))
+
     # print board
     def __repr__(self):
-        rtnString = "  " + " ".join(Board._alphabet[:self.sizeX]) + "\n"
+        rtnString = self._columnMarkers()
+        rowLabelWidth = len(self._label(self.sizeY - 1))
         for j, row in enumerate(self.visibility):
-            rtnString += Board._alphabet[j] + " "
+            rtnString += self._label(j).rjust(rowLabelWidth) + " "
             for i, e in enumerate(row):
                 if e is Board._tile.revealed:
                     rtnString += (" " if self.grid[j][i] is Board._tile.blank else (
@@ -76,43 +90,75 @@ class Board:
                     rtnString += "▓▓"
                 else:
                     rtnString += "██"
-            rtnString += Board._alphabet[j] + "\n"
-        rtnString += "  " + " ".join(Board._alphabet[:self.sizeX]) + "\n"
+            rtnString += self._label(j) + "\n"
+        rtnString += self._columnMarkers()
         return rtnString
 
-    # Generator which yields the coordinates of any surrounding cells
+    # Returns the coordinates of any surrounding cells from a table shared by every board of the same size,
+    # or works them out on boards too big to tabulate
     def _getSurroundingCoordList(self, x, y):
-        surroundingPositions = [(x - 1, y - 1), (x, y - 1), (x + 1, y - 1), (x - 1, y), (x + 1, y), (x - 1, y + 1),
-                                (x, y + 1), (x + 1, y + 1)]
-        for x, y in surroundingPositions:
-            if x in range(self.sizeX) and y in range(self.sizeY):
-                yield x, y
-
-    # Converts alphabetical entries into numeric coordinates.
+        if self._surroundingCoords is None:
+            return Board._surroundingCoordsOf(x, y, self.sizeX, self.sizeY)
+        return self._surroundingCoords[y][x]
+
+    @staticmethod
+    def _surroundingCoordsOf(x, y, sizeX, sizeY):
+        columns = range(max(x - 1, 0), min(x + 2, sizeX))
+        return tuple((i, j) for j in range(max(y - 1, 0), min(y + 2, sizeY)) for i in columns if i != x or j != y)
+
+    # Neighbour tables keyed by (sizeX, sizeY), keeping only the most recently used sizes.
+    # Boards with more cells than the limit have no table.
+    _surroundingCoordTables = OrderedDict()
+    _surroundingCoordTableLimit = 32
+    _surroundingCoordTableMaxCells = 1 << 16
+
+    @staticmethod
+    def _buildSurroundingCoordTable(sizeX, sizeY):
+        if sizeX * sizeY > Board._surroundingCoordTableMaxCells:
+            return None
+        table = Board._surroundingCoordTables.pop((sizeX, sizeY), None)
+        if table is None:
+            table = [[Board._surroundingCoordsOf(x, y, sizeX, sizeY) for x in range(sizeX)] for y in range(sizeY)]
+            if len(Board._surroundingCoordTables) >= Board._surroundingCoordTableLimit:
+                Board._surroundingCoordTables.popitem(last=False)
+        Board._surroundingCoordTables[(sizeX, sizeY)] = table
+        return table
+
+    # Converts alphabetical or numeric entries into coordinates.
     def _alphaToCoords(self, a, b):
-        if a not in Board._alphabet or b not in Board._alphabet:
-            print("These aren't letters. Try something like \"a a\"")
+        if a.isdigit() and b.isdigit():
+            x = int(a) - 1
+            y = int(b) - 1
+        elif a in Board._alphabet and b in Board._alphabet:
+            x = Board._alphabet.index(a)
+            y = Board._alphabet.index(b)
+        else:
+            print("These aren't coordinates. Try something like \"a a\" or \"1 1\"")
             return -1, -1
 
-        x = Board._alphabet.index(a)
-        y = Board._alphabet.index(b)
-
         if x not in range(self.sizeX) or y not in range(self.sizeY):
             print("These coordinates won't do, they aren't on the board.")
             return -1, -1
 
         return x, y
 
-    # Recursively unhide cells.
+    # Unhide a cell, flooding outwards from blank cells with an explicit stack.
     def _reveal(self, x, y):
+        if self.visibility[y][x] is Board._tile.hidden:
+            self.hiddenCells -= 1
         self.visibility[y][x] = Board._tile.revealed
-
         if self.grid[y][x] is Board._tile.mine:
             return False
-        elif self.grid[y][x] is Board._tile.blank:
-            for i, j in self._getSurroundingCoordList(x, y):
-                if self.visibility[j][i] is Board._tile.hidden:
-                    self._reveal(i, j)
+
+        stack = [(x, y)]
+        while stack:
+            i, j = stack.pop()
+            if self.grid[j][i] is Board._tile.blank:
+                for k, l in self._getSurroundingCoordList(i, j):
+                    if self.visibility[l][k] is Board._tile.hidden:
+                        self.visibility[l][k] = Board._tile.revealed
+                        self.hiddenCells -= 1
+                        stack.append((k, l))
 
         return True
 
@@ -148,17 +194,18 @@ class Board:
         if self.visibility[y][x] is Board._tile.flagged:
             self.visibility[y][x] = Board._tile.hidden
             self.flags -= 1
+            self.hiddenCells += 1
         elif self.visibility[y][x] is Board._tile.hidden:
             self.visibility[y][x] = Board._tile.flagged
             self.flags += 1
+            self.hiddenCells -= 1
         else:
             print("You cannot flag this space.")
 
     # Returns true if there are still hidden cells, otherwise, it returns false.
     def _checkEndGame(self):
-        for row in self.visibility:
-            if Board._tile.hidden in row:
-                return True
+        if self.hiddenCells:
+            return True
 
         return (self.mines != self.flags)
 
@@ -179,13 +226,13 @@ class Board:
                 else:
                     prompt = ""
                 continue
-            elif len(readIn) == 3 and readIn[0] in Board._alphabet and readIn[2] in Board._alphabet and readIn[
-                1] == " ":
+            elif len(readIn.split()) == 2:
+                a, b = readIn.split()
                 if prompt == "":
-                    if not self.reveal(readIn[0], readIn[2]):
+                    if not self.reveal(a, b):
                         break
                 else:
-                    self.toggleFlag(readIn[0], readIn[2])
+                    self.toggleFlag(a, b)
 
         # handle end-game
         if not self._checkEndGame():
@@ -1,13 +1,81 @@
 # coding=utf-8
+import collections
 import random
-from itertools import chain
 
+import numpy as np
+
+
+class Board(object):
+    # Boards are kept small so that one process can host many games at once: tile state lives in
+    # a few bytes of NumPy arrays per tile and the board itself has no __dict__.
+    __slots__ = ("width", "height", "neighbours", "is_mine_triggered", "number_of_flags",
+                 "mineGrid", "nearbyMinesGrid", "hiddenGrid", "flaggedGrid", "sharedGrids",
+                 "number_of_mines", "number_of_hidden_safe_tiles", "number_of_flagged_mines",
+                 "rowCache", "columnMarkerCache")
 
-class Board:
     alphabet = ["a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", "m", "n", "o", "p", "q", "r", "s", "t", "u",
                 "v", "w", "x", "y", "z", "aa", "bb", "cc", "dd"]
 
-    class Tile:
+    # Value stored in mineGrid for a tile that hasn't been decided as a mine or not yet.
+    # The AI's local board uses this as the third state of isMine.
+    UNDECIDED = -1
+
+    # Names of the arrays that hold the state of every tile
+    GRIDS = ("mineGrid", "nearbyMinesGrid", "hiddenGrid", "flaggedGrid")
+
+    # Neighbour tables shared by every board of the same size, keyed by (width, height).
+    # Only the most recently used sizes are kept; boards hold on to their own table regardless.
+    # Boards up to NEIGHBOUR_TUPLE_LIMIT tiles get a list of tuples, which is the fastest to look up. Bigger ones
+    # get a NeighbourTable, a tenth of the size, and boards with more tiles than NEIGHBOUR_TABLE_LIMIT compute
+    # their neighbours on demand instead.
+    neighbourTables = collections.OrderedDict()
+    NEIGHBOUR_TABLE_CACHE_SIZE = 32
+    NEIGHBOUR_TUPLE_LIMIT = 1 << 12
+    NEIGHBOUR_TABLE_LIMIT = 1 << 16
+
+    # (dx, dy) of the surrounding tiles, in the order neighbours are listed
+    SURROUNDING_OFFSETS = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+    @staticmethod
+    def surrounding_indices(x, y, width, height):
+        columns = range(max(x - 1, 0), min(x + 2, width))
+        return tuple(j * width + i for j in range(max(y - 1, 0), min(y + 2, height)) for i in columns
+                     if i != x or j != y)
+
+    @staticmethod
+    def neighbour_table(width, height):
+        if width * height > Board.NEIGHBOUR_TABLE_LIMIT:
+            return Board.NeighbourIndices(width, height)
+        table = Board.neighbourTables.pop((width, height), None)
+        if table is None:
+            table = Board.NeighbourTable(width, height)
+            if width * height <= Board.NEIGHBOUR_TUPLE_LIMIT:
+                table = table.as_tuples()
+            if len(Board.neighbourTables) >= Board.NEIGHBOUR_TABLE_CACHE_SIZE:
+                Board.neighbourTables.popitem(last=False)
+        Board.neighbourTables[(width, height)] = table
+        return table
+
+    @staticmethod
+    def tile_symbol(isMine, isHidden, isFlagged, nearbyMines):
+        if not isHidden and isMine:
+            if isFlagged:
+                return "⚐ "
+            else:
+                return "X "
+
+        if isFlagged:
+            return "⚑ "
+        elif isHidden:
+            return "██"
+        elif nearbyMines == 0:
+            return "  "
+        else:
+            return str(nearbyMines) + " "
+
+    class Tile(object):
+        __slots__ = ("position", "nearbyMines", "isMine", "isHidden", "isFlagged")
+
         def __init__(self, x, y):
             self.position = (x, y)
             self.nearbyMines = 0
@@ -27,20 +95,7 @@ class Board:
             return str(self.nearbyMines)
 
         def __str__(self):
-            if not self.isHidden and self.isMine:
-                if self.isFlagged:
-                    return "⚐ "
-                else:
-                    return "X "
-
-            if self.isFlagged:
-                return "⚑ "
-            elif self.isHidden:
-                return "██"
-            elif self.nearbyMines == 0:
-                return "  "
-            else:
-                return str(self.nearbyMines) + " "
+            return Board.tile_symbol(self.isMine, self.isHidden, self.isFlagged, self.nearbyMines)
 
         def set_as_mine(self):
             self.isMine = True
@@ -55,152 +110,395 @@ class Board:
             self.isFlagged = not self.isFlagged
             return self.isFlagged
 
+    class TileView(Tile):
+        # A Tile whose state lives in the arrays of the board it belongs to.
+        # Views are created on demand, so two views of the same position compare equal.
+        __slots__ = ("board", "index")
+
+        def __init__(self, board, x, y):
+            self.board = board
+            self.position = (x, y)
+            self.index = y * board.width + x
+
+        def __eq__(self, other):
+            return isinstance(other, Board.TileView) and self.board is other.board and self.index == other.index
+
+        def __ne__(self, other):
+            return not self == other
+
+        def __hash__(self):
+            return hash(self.position)
+
+        @property
+        def nearbyMines(self):
+            return self.board.nearbyMinesGrid.item(self.index)
+
+        @nearbyMines.setter
+        def nearbyMines(self, number):
+            self.board.set_nearby_mines(self.index, number)
+
+        @property
+        def isMine(self):
+            value = self.board.mineGrid.item(self.index)
+            if value == Board.UNDECIDED:
+                return None
+            return value == 1
+
+        @isMine.setter
+        def isMine(self, value):
+            self.board.set_mine(self.index, Board.UNDECIDED if value is None else int(bool(value)))
+
+        @property
+        def isHidden(self):
+            return self.board.hiddenGrid.item(self.index)
+
+        @isHidden.setter
+        def isHidden(self, value):
+            self.board.set_hidden(self.index, value)
+
+        @property
+        def isFlagged(self):
+            return self.board.flaggedGrid.item(self.index)
+
+        @isFlagged.setter
+        def isFlagged(self, value):
+            self.board.set_flagged(self.index, value)
+
+    class NeighbourTable(object):
+        # Neighbours of every tile as flat indices, one row of eight per tile in a single int32 array.
+        # Each row lists its neighbours first and is padded with -1 after them.
+        __slots__ = ("indices", "counts")
+
+        def __init__(self, width, height):
+            y, x = np.divmod(np.arange(width * height, dtype=np.int32), width)
+            columns = []
+            for dx, dy in Board.SURROUNDING_OFFSETS:
+                onBoard = (0 <= x + dx) & (x + dx < width) & (0 <= y + dy) & (y + dy < height)
+                columns.append(np.where(onBoard, (y + dy) * width + x + dx, -1))
+            indices = np.stack(columns, axis=1).astype(np.int32)
+            # Move the padding behind the neighbours, keeping their order
+            order = np.argsort(indices < 0, axis=1, kind="mergesort")
+            self.indices = np.take_along_axis(indices, order, axis=1)
+            self.counts = (indices >= 0).sum(axis=1).astype(np.uint8)
+
+        def __getitem__(self, index):
+            return self.indices[index, :self.counts.item(index)].tolist()
+
+        def as_tuples(self):
+            return [tuple(row[:count]) for row, count in zip(self.indices.tolist(), self.counts.tolist())]
+
+        def __len__(self):
+            return len(self.counts)
+
+    class NeighbourIndices(object):
+        # Stands in for a neighbour table on boards too large to tabulate, computing each entry on demand.
+        __slots__ = ("width", "height")
+
+        def __init__(self, width, height):
+            self.width = width
+            self.height = height
+
+        def __getitem__(self, index):
+            y, x = divmod(index, self.width)
+            return Board.surrounding_indices(x, y, self.width, self.height)
+
+    class TileGrid(object):
+        # Rows of TileViews, built lazily so that boards never hold a Python object per tile.
+        __slots__ = ("board",)
+
+        def __init__(self, board):
+            self.board = board
+
+        def __len__(self):
+            return self.board.height
+
+        def __getitem__(self, y):
+            if y < 0:
+                y += self.board.height
+            if not 0 <= y < self.board.height:
+                raise IndexError("row index out of range")
+            return [Board.TileView(self.board, x, y) for x in range(self.board.width)]
+
+        def __iter__(self):
+            for y in range(self.board.height):
+                yield self[y]
+
     def __init__(self, width, height):
         self.width = width
         self.height = height
+        self.neighbours = Board.neighbour_table(width, height)
         self.is_mine_triggered = False
         self.initialize_grid()
         self.number_of_flags = 0
 
     def initialize_grid(self):
-        self.minePositions = []
-        self.grid = [
-            [Board.Tile(x, y) for x in range(self.width)] for y in
-            range(self.height)]
+        shape = (self.height, self.width)
+        self.mineGrid = np.zeros(shape, dtype=np.int8)
+        self.nearbyMinesGrid = np.zeros(shape, dtype=np.uint8)
+        self.hiddenGrid = np.ones(shape, dtype=np.bool_)
+        self.flaggedGrid = np.zeros(shape, dtype=np.bool_)
+        self.sharedGrids = set()
+        self.columnMarkerCache = None
+        self.invalidate_rows()
+        self.count_end_game_state()
+
+    def count_end_game_state(self):
+        # Running totals that let check_end_game_win answer without scanning the board.
+        # Everything that changes a tile keeps them up to date; bulk changes call this again.
+        isMine = self.mineGrid == 1
+        self.number_of_mines = int(np.count_nonzero(isMine))
+        self.number_of_hidden_safe_tiles = int(np.count_nonzero(self.hiddenGrid & ~isMine))
+        self.number_of_flagged_mines = int(np.count_nonzero(self.flaggedGrid & isMine))
+
+    @property
+    def grid(self):
+        return Board.TileGrid(self)
 
     def copy(self):
-        new = Board(self.width, self.height)
-        new.is_mine_triggered = self.is_mine_triggered
-        new.number_of_flags = self.number_of_flags
-        new.minePositions = self.minePositions[:]
-        new.grid = []
-        for row in self.grid:
-            newRow = []
-            for tile in row:
-                newRow.append(tile.copy())
-            new.grid.append(newRow)
+        # The copy shares its arrays with this board. Whichever board writes to an array first
+        # takes its own copy of it (see own_grid), so a snapshot costs nothing until it diverges.
+        new = Board.__new__(Board)
+        for name in Board.__slots__:
+            setattr(new, name, getattr(self, name))
+        self.sharedGrids = set(Board.GRIDS)
+        new.sharedGrids = set(Board.GRIDS)
+        new.rowCache = self.rowCache[:]
         return new
 
-    def place_mines(self, numberOfMinesToPlace, tileToAvoid):
-        for i in range(numberOfMinesToPlace):
-            tile = self.pick_random_unused_mine_position(tileToAvoid)
-            tile.set_as_mine()
-            self.increment_tiles_around_mine(tile)
-            self.minePositions.append(tile)
-
-    def pick_random_unused_mine_position(self, tileToAvoid):
-        tile = self.pick_random_tile()
-        while tile in self.minePositions or tile is tileToAvoid:
-            tile = self.pick_random_tile()
-        return tile
-
-    def pick_random_tile(self):
-        x = random.randint(0, self.width - 1)
-        y = random.randint(0, self.height - 1)
-        return self.convert_coordinate_to_tile(x, y)
+    def own_grid(self, name):
+        # Returns the named array, copying it first if it is still shared with another board.
+        if name in self.sharedGrids:
+            setattr(self, name, getattr(self, name).copy())
+            self.sharedGrids.discard(name)
+        return getattr(self, name)
+
+    def place_mines(self, numberOfMinesToPlace, *tilesToAvoid):
+        # Sample mine positions without replacement from every tile that isn't being avoided or a mine already.
+        # The generator is seeded from `random` so that random.seed() still reproduces a board.
+        allowed = self.mineGrid.ravel() != 1
+        for tile in tilesToAvoid:
+            x, y = tile.position
+            allowed[y * self.width + x] = False
+        candidates = np.flatnonzero(allowed)
+        if numberOfMinesToPlace > len(candidates):
+            raise ValueError("Invalid number of mines.")
+        generator = np.random.RandomState(random.getrandbits(32))
+        chosen = candidates[generator.choice(len(candidates), numberOfMinesToPlace, replace=False)]
+        self.own_grid("mineGrid").flat[chosen] = 1
+        self.count_nearby_mines()
+        self.count_end_game_state()
+        self.invalidate_rows()
+
+    @property
+    def minePositions(self):
+        ys, xs = np.nonzero(self.mineGrid == 1)
+        return set(zip(xs.tolist(), ys.tolist()))
+
+    def count_nearby_mines(self):
+        # Convolve the mine mask with a 3x3 kernel of ones (minus the centre) in a single pass
+        # by summing the eight shifted views of a zero-padded copy.
+        padded = np.pad((self.mineGrid == 1).astype(np.uint8), 1, 'constant')
+        counts = np.zeros((self.height, self.width), dtype=np.uint8)
+        for dy in range(3):
+            for dx in range(3):
+                if (dx, dy) != (1, 1):
+                    counts += padded[dy:dy + self.height, dx:dx + self.width]
+        self.nearbyMinesGrid = counts
+        self.sharedGrids.discard("nearbyMinesGrid")
+        self.invalidate_rows()
 
     def increment_tiles_around_mine(self, centerTile):
-        for tile in self.surrounding_tiles(centerTile):
-            tile.nearbyMines += 1
+        x, y = centerTile.position
+        nearbyMinesGrid = self.own_grid("nearbyMinesGrid")
+        nearbyMinesGrid[max(y - 1, 0):y + 2, max(x - 1, 0):x + 2] += 1
+        nearbyMinesGrid[y, x] -= 1
+        for rowNumber in range(max(y - 1, 0), min(y + 2, self.height)):
+            self.rowCache[rowNumber] = None
+
+    def set_nearby_mines(self, index, number):
+        self.own_grid("nearbyMinesGrid").itemset(index, number)
+        self.rowCache[index // self.width] = None
+
+    def set_mine(self, index, value):
+        wasMine = self.mineGrid.item(index) == 1
+        self.own_grid("mineGrid").itemset(index, value)
+        isMine = value == 1
+        if wasMine != isMine:
+            self.rowCache[index // self.width] = None
+            change = 1 if isMine else -1
+            self.number_of_mines += change
+            if self.hiddenGrid.item(index):
+                self.number_of_hidden_safe_tiles -= change
+            if self.flaggedGrid.item(index):
+                self.number_of_flagged_mines += change
+
+    def set_hidden(self, index, isHidden):
+        if self.hiddenGrid.item(index) != isHidden:
+            self.own_grid("hiddenGrid").itemset(index, isHidden)
+            self.rowCache[index // self.width] = None
+            if self.mineGrid.item(index) != 1:
+                self.number_of_hidden_safe_tiles += 1 if isHidden else -1
+
+    def set_flagged(self, index, isFlagged):
+        if self.flaggedGrid.item(index) != isFlagged:
+            self.own_grid("flaggedGrid").itemset(index, isFlagged)
+            self.rowCache[index // self.width] = None
+            if self.mineGrid.item(index) == 1:
+                self.number_of_flagged_mines += 1 if isFlagged else -1
 
     def toggle_flag(self, x, y):
         if self.is_valid_coordinate(x, y):
-            tile = self.convert_coordinate_to_tile(x, y)
-            if tile.isHidden:
-                if tile.toggle_flag():
+            index = y * self.width + x
+            if self.hiddenGrid.item(index):
+                isFlagged = not self.flaggedGrid.item(index)
+                self.set_flagged(index, isFlagged)
+                if isFlagged:
                     self.number_of_flags += 1
                 else:
                     self.number_of_flags -= 1
+                if self.check_end_game_win():
+                    self.reveal_whole_board()
 
     def reveal(self, x, y):
         tilesRevealed = []
         if self.is_valid_coordinate(x, y):
-            tile = self.convert_coordinate_to_tile(x, y)
-            if not tile.isHidden and tile.nearbyMines > 0:
-                numFlags = sum(map(lambda s: s.isFlagged, self.surrounding_tiles(tile)))
-                if numFlags == tile.nearbyMines:
-                    tilesRevealed = list(chain.from_iterable(
-                        map(self.reveal_recursive, self.surrounding_tiles(tile)))) + self.reveal_recursive(tile)
+            index = y * self.width + x
+            nearbyMines = self.nearbyMinesGrid.item(index)
+            if not self.hiddenGrid.item(index) and nearbyMines > 0:
+                neighbours = self.neighbours[index]
+                numFlags = sum(map(self.flaggedGrid.item, neighbours))
+                if numFlags == nearbyMines:
+                    tilesRevealed = self.flood_reveal(neighbours)
             else:
-                tilesRevealed = self.reveal_recursive(tile)
-        self.check_end_game_win()
+                tilesRevealed = self.flood_reveal([index])
+        if self.check_end_game_win():
+            self.reveal_whole_board()
         return tilesRevealed
 
-    def reveal_recursive(self, centerTile):
-        if not centerTile.isFlagged:
-            centerTile.reveal()
-            tilesRevealed = [centerTile]
-            if centerTile.isMine:
+    def flood_reveal(self, startIndices):
+        # Reveal the given tiles and flood outwards from any blank ones with an explicit stack.
+        # Tiles are unhidden as they are pushed, so each one is visited and returned only once.
+        tilesRevealed = []
+        stack = []
+        for index in startIndices:
+            if self.hiddenGrid.item(index) and not self.flaggedGrid.item(index):
+                self.set_hidden(index, False)
+                stack.append(index)
+
+        while stack:
+            index = stack.pop()
+            tilesRevealed.append(self.index_to_tile(index))
+            if self.mineGrid.item(index) == 1:
                 self.is_mine_triggered = True
-                self.reveal_whole_board()
-            if centerTile.nearbyMines == 0:
-                for tile in self.surrounding_tiles(centerTile):
-                    if tile.isHidden and not tile.isFlagged:
-                        tilesRevealed.extend(self.reveal_recursive(tile))
-            return tilesRevealed
-        else:
-            return []
+            elif self.nearbyMinesGrid.item(index) == 0:
+                for neighbour in self.neighbours[index]:
+                    if self.hiddenGrid.item(neighbour) and not self.flaggedGrid.item(neighbour):
+                        self.set_hidden(neighbour, False)
+                        stack.append(neighbour)
+
+        if self.is_mine_triggered:
+            self.reveal_whole_board()
+        return tilesRevealed
+
+    def surrounding_positions(self, x, y):
+        for index in self.neighbours[y * self.width + x]:
+            y, x = divmod(index, self.width)
+            yield x, y
 
     def surrounding_tiles(self, tile):
-        x, y = tile.position
-        surroundingPositions = [(x - 1, y - 1), (x, y - 1), (x + 1, y - 1),
-                                (x - 1, y), (x + 1, y), (x - 1, y + 1),
-                                (x, y + 1), (x + 1, y + 1)]
-        for x, y in surroundingPositions:
-            if self.is_valid_coordinate(x, y):
-                yield self.convert_coordinate_to_tile(x, y)
+        for x, y in self.surrounding_positions(*tile.position):
+            yield Board.TileView(self, x, y)
+
+    def index_to_tile(self, index):
+        y, x = divmod(index, self.width)
+        return Board.TileView(self, x, y)
 
     def convert_coordinate_to_tile(self, x, y):
-        return self.grid[y][x]
+        return Board.TileView(self, x, y)
 
     def is_valid_coordinate(self, x, y):
-        return x in range(self.width) and y in range(self.height)
+        return 0 <= x < self.width and 0 <= y < self.height
 
     def check_end_game_loss(self):
         return self.is_mine_triggered
 
     def check_end_game_win(self):
-        for row in self.grid:
-            for tile in row:
-                if (tile.isHidden and not tile.isMine) \
-                        or (tile.isMine and not tile.isFlagged):
-                    return False
-        self.reveal_whole_board()
-        return True
+        return self.number_of_hidden_safe_tiles == 0 and self.number_of_flagged_mines == self.number_of_mines
 
     def reveal_whole_board(self):
-        for row in self.grid:
-            for tile in row:
-                tile.reveal()
+        self.hiddenGrid = np.zeros((self.height, self.width), dtype=np.bool_)
+        self.sharedGrids.discard("hiddenGrid")
+        self.number_of_hidden_safe_tiles = 0
+        self.invalidate_rows()
+
+    def invalidate_rows(self):
+        # Rendered rows are cached; anything that changes tiles throws away the rows it touched.
+        self.rowCache = [None] * self.height
 
     def __repr__(self):
-        rtnString = self.column_markers()
-        rtnString += self.inner_board()
-        rtnString += self.column_markers()
-        return rtnString
+        columnMarkers = self.column_markers()
+        return "".join((columnMarkers, self.inner_board(), columnMarkers))
+
+    def uses_numeric_labels(self):
+        # Boards too big to label with the alphabet are labelled with numbers starting from 1
+        return max(self.width, self.height) > len(Board.alphabet)
+
+    def label(self, number):
+        if self.uses_numeric_labels():
+            return str(number + 1)
+        return Board.alphabet[number]
+
+    def label_to_coordinate(self, label, size):
+        label = label.lower()
+        if label.isdigit():
+            number = int(label) - 1
+        elif label in Board.alphabet:
+            number = Board.alphabet.index(label)
+        else:
+            raise ValueError("'%s' isn't a coordinate" % label)
+        if not 0 <= number < size:
+            raise ValueError("'%s' isn't on the board" % label)
+        return number
 
     def column_markers(self):
-        return "  " + " ".join(Board.alphabet[:self.width]) + "\n"
+        if self.columnMarkerCache is None:
+            if not self.uses_numeric_labels():
+                self.columnMarkerCache = "  " + " ".join(Board.alphabet[:self.width]) + "\n"
+            else:
+                # Numeric column labels are written downwards, one line per digit
+                digits = len(str(self.width))
+                labels = [self.label(x).rjust(digits) for x in range(self.width)]
+                margin = " " * (len(str(self.height)) + 1)
+                self.columnMarkerCache = "".join(
+                    margin + " ".join(label[place] for label in labels) + "\n" for place in range(digits))
+        return self.columnMarkerCache
 
     def inner_board(self):
-        rtnString = ""
-        for rowNumber, row in enumerate(self.grid):
-            rtnString += self.inner_board_start_row_marker(rowNumber)
-            rtnString += self.inner_board_row_tiles(row)
-            rtnString += self.inner_board_end_row_marker(rowNumber)
-        return rtnString
-
-    def inner_board_row_tiles(self, row):
-        rtnString = ""
-        for tile in row:
-            rtnString += str(tile)
-        return rtnString
+        return "".join(map(self.inner_board_row, range(self.height)))
+
+    def inner_board_row(self, rowNumber):
+        row = self.rowCache[rowNumber]
+        if row is None:
+            row = "".join((self.inner_board_start_row_marker(rowNumber),
+                           self.inner_board_row_tiles(rowNumber),
+                           self.inner_board_end_row_marker(rowNumber)))
+            self.rowCache[rowNumber] = row
+        return row
+
+    def inner_board_row_tiles(self, rowNumber):
+        return "".join(map(Board.tile_symbol,
+                           (self.mineGrid[rowNumber] == 1).tolist(),
+                           self.hiddenGrid[rowNumber].tolist(),
+                           self.flaggedGrid[rowNumber].tolist(),
+                           self.nearbyMinesGrid[rowNumber].tolist()))
 
     def inner_board_start_row_marker(self, rowNumber):
+        if self.uses_numeric_labels():
+            return self.label(rowNumber).rjust(len(str(self.height))) + " "
         return Board.alphabet[rowNumber] + " "
 
     def inner_board_end_row_marker(self, rowNumber):
-        return " " + Board.alphabet[rowNumber] + "\n"
+        return " " + self.label(rowNumber) + "\n"
 
 
 class Game:
@@ -247,12 +545,11 @@ class Game:
     def process_input(self, userInput):
         try:
             xAlpha, yAlpha = userInput.split()
-            if xAlpha.lower() in self.board.alphabet and yAlpha in self.board.alphabet:
-                x, y = self.alpha_to_coordinates(xAlpha, yAlpha)
-                if self.isInFlagMode:
-                    self.board.toggle_flag(x, y)
-                else:
-                    return self.reveal(x, y)
+            x, y = self.alpha_to_coordinates(xAlpha, yAlpha)
+            if self.isInFlagMode:
+                self.board.toggle_flag(x, y)
+            else:
+                return self.reveal(x, y)
         except ValueError:
             if len(userInput) == 1 and userInput[0].lower() == 'f':
                 self.toggle_flag_mode()
@@ -266,8 +563,9 @@ class Game:
         return self.reveal_callback(x, y)
 
     def alpha_to_coordinates(self, a, b):
-        x = self.board.alphabet.index(a.lower())
-        y = self.board.alphabet.index(b.lower())
+        # Accepts the labels shown around the board: letters, or numbers on boards too big for letters
+        x = self.board.label_to_coordinate(a, self.board.width)
+        y = self.board.label_to_coordinate(b, self.board.height)
         return x, y
 
     def show_errors(self):
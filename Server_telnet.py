@@ -1,18 +1,164 @@
 #!python
 __author__ = 'JacobAMason'
 
+import argparse
+import json
+
 from twisted.internet.protocol import ServerFactory
+from twisted.internet.interfaces import IPushProducer
 from twisted.conch.telnet import StatefulTelnetProtocol
 from twisted.internet import reactor
+from zope.interface import implementer
+
+from Client import GameStateMachine, HELP_MESSAGE
+from Minesweeper_tdd import Game
+
+# Connections served at once, the ones past it are turned away
+MAX_CONNECTIONS = 4096
+
+# Boards a JSON client may ask for, as name: (width, height, mines). Only a few sizes are offered since every
+# size needs its own neighbour table.
+BOARD_SIZES = {"beginner": (8, 8, 10),
+               "intermediate": (16, 16, 40),
+               "expert": (30, 16, 99)}
+
 
-from time import sleep
 class ShellTelnet():
     def __init__(self):
        pass
 
+
+class TelnetStateMachine(GameStateMachine):
+    def __init__(self, user, protocol):
+        self.protocol = protocol
+        GameStateMachine.__init__(self, user)
+
+    def msg(self, message):
+        self.protocol.queue(message)
+
+    def evicted(self):
+        GameStateMachine.evicted(self)
+        self.protocol.flush()
+
+
+class JsonSession(object):
+    # A game played by an automated client, one JSON object per line each way. Nothing is rendered.
+    #
+    #   {"id": 1, "new": "intermediate"}
+    #   {"id": 2, "moves": [["reveal", 3, 4], ["flag", 0, 0]]}
+    #
+    # Games come in the sizes in BOARD_SIZES, and starting one is answered with its width, height and mines.
+    # Coordinates are zero based column and row numbers. A request may start a new game, play a batch of moves
+    # or both, and is answered with the results of each move in order, the game status and the mines left:
+    #
+    #   {"id": 2, "results": [{"revealed": [[3, 4, 0], [2, 4, 1]]}, {"flagged": true}],
+    #    "status": "playing", "minesLeft": 39}
+    #
+    # A move that hits a mine adds "mine": [x, y] to its result. Moves after the game has ended aren't played.
+    def __init__(self, user, protocol):
+        self.user = user
+        self.protocol = protocol
+        self.game = None
+        GameStateMachine.clients[user] = self
+
+    def evicted(self):
+        self.msg({"event": "evicted"})
+        self.protocol.flush()
+
+    def msg(self, response):
+        self.protocol.queue(json.dumps(response, separators=(",", ":")))
+
+    def respond(self, line):
+        response = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("A request must be a JSON object.")
+            if "id" in request:
+                response["id"] = request["id"]
+            if "new" in request:
+                self.new_game(request["new"])
+                response["width"], response["height"], response["mines"] = BOARD_SIZES[request["new"]]
+            if "moves" in request:
+                response["results"] = self.play(request["moves"])
+        except ValueError as e:
+            response["error"] = str(e)
+        if self.game is not None:
+            response["status"] = self.status()
+            response["minesLeft"] = self.game.mines - self.game.board.number_of_flags
+        self.msg(response)
+
+    def new_game(self, size):
+        if not isinstance(size, basestring) or size not in BOARD_SIZES:
+            raise ValueError("'new' must be one of %s." % ", ".join(sorted(BOARD_SIZES)))
+        self.game = Game()
+        self.game.generate_board(*BOARD_SIZES[size])
+
+    def status(self):
+        if self.game.board.check_end_game_loss():
+            return "lost"
+        elif self.game.board.check_end_game_win():
+            return "won"
+        return "playing"
+
+    def play(self, moves):
+        if self.game is None:
+            raise ValueError("Start a game with 'new' first.")
+        if not isinstance(moves, list):
+            raise ValueError("'moves' must be a list of [action, x, y].")
+        return [self.play_move(move) for move in moves]
+
+    def play_move(self, move):
+        board = self.game.board
+        if self.status() != "playing":
+            return {"error": "The game is over."}
+        if not isinstance(move, list) or len(move) != 3 or \
+                any(type(value) not in (int, long) for value in move[1:]):
+            return {"error": "A move must be [action, x, y]."}
+        action, x, y = move
+        if not board.is_valid_coordinate(x, y):
+            return {"error": "That tile isn't on the board."}
+        if action == "reveal":
+            result = {"revealed": []}
+            for tile in self.game.reveal(x, y):
+                tileY, tileX = divmod(tile.index, board.width)
+                if board.mineGrid.item(tile.index) == 1:
+                    result["mine"] = [tileX, tileY]
+                else:
+                    result["revealed"].append([tileX, tileY, board.nearbyMinesGrid.item(tile.index)])
+            return result
+        elif action == "flag":
+            board.toggle_flag(x, y)
+            return {"flagged": bool(board.flaggedGrid.item(y * board.width + x))}
+        return {"error": "The action must be 'reveal' or 'flag'."}
+
+
+@implementer(IPushProducer)
 class TelnetServerProtocol(StatefulTelnetProtocol):
+    # Every connection plays its own game through a TelnetStateMachine, the same state machine the IRC bot uses.
+    #
+    # Everything a line of input produces is queued and written in one go once the line is handled. The
+    # protocol is registered as a producer with its transport, so when a client doesn't read its output fast
+    # enough the transport pauses it. LineReceiver's pausing then stops handling the lines it already has from
+    # that client and stops reading more, until the output has drained.
+    #
+    # Lines starting with "{" are requests for the connection's JsonSession, kept apart from its text game.
+    delimiter = "\n"
+    user = None
+
     def connectionMade(self):
         print "DEBUG: connectionMade called"
+        self.outbox = []
+        if self.factory.numberOfConnections >= self.factory.maxConnections:
+            self.sendLine("Too many people are playing, try again later.\r")
+            self.transport.loseConnection()
+            return
+        self.factory.numberOfConnections += 1
+        self.factory.connectionsStarted += 1
+        self.user = "telnet:%d" % self.factory.connectionsStarted
+        self.jsonUser = self.user + ":json"
+        self.transport.registerProducer(self, True)
+
         banner = [
 "   ____    ____  _                                                          ",
 "  |_   \  /   _|(_)                                                         ",
@@ -24,27 +170,63 @@ class TelnetServerProtocol(StatefulTelnetProtocol):
         ]
 
         for line in banner:
-            self.sendLine(line + "\r")
+            self.queue(line)
+        self.queue("Say 'start' to start a game.")
+        self.flush()
+
+    def queue(self, message):
+        self.outbox.append(message.rstrip("\n").replace("\n", "\r\n") + "\r\n")
+
+    def flush(self):
+        if self.outbox:
+            self.transport.write("".join(self.outbox))
+            self.outbox = []
 
     def lineReceived(self, line):
         line = line.strip()
-        print "DEBUG: lineReceived called with %s" % line
-        if line != "exit":
-            self.sendLine("Echo: " + line + "\r")
-        else:
-            self.sendLine("Bye")
+        if line == "exit":
+            self.queue("Bye")
+            self.flush()
             self.transport.loseConnection()
-        self.clearLineBuffer()
+            return
+        elif line.startswith("{"):
+            if self.jsonUser not in GameStateMachine.clients:
+                JsonSession(self.jsonUser, self)
+            GameStateMachine.clients[self.jsonUser].respond(line)
+        elif line == "help":
+            self.queue(HELP_MESSAGE)
+        elif self.user in GameStateMachine.clients:
+            GameStateMachine.clients[self.user].respond(line)
+        elif line == "start":
+            TelnetStateMachine(self.user, self)
+        else:
+            self.queue("*wat*\nSay 'help' to figure this thing out.")
+        self.flush()
 
     def connectionLost(self, reason):
         print "DEBUG: connectionLost called with: %s" % str(reason)
+        if self.user is not None:
+            GameStateMachine.clients.pop(self.user, None)
+            GameStateMachine.clients.pop(self.jsonUser, None)
+            self.factory.numberOfConnections -= 1
+
+
+class TelnetServerFactory(ServerFactory):
+    protocol = TelnetServerProtocol
+
+    def __init__(self, maxConnections=MAX_CONNECTIONS):
+        self.maxConnections = maxConnections
+        self.numberOfConnections = 0
+        self.connectionsStarted = 0
 
-def TelnetServerFactory():
-    factory = ServerFactory()
-    factory.protocol = TelnetServerProtocol
-    return factory
 
 if __name__ == "__main__":
-    protocol = TelnetServerFactory()
-    reactor.listenTCP(23, protocol)
-    reactor.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Serve Minesweeper games over telnet.")
+    parser.add_argument("port", nargs="?", type=int, default=23, help="port to listen on")
+    parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS,
+                        help="connections served at once, the ones past it are turned away")
+    options = parser.parse_args()
+    protocol = TelnetServerFactory(options.max_connections)
+    reactor.listenTCP(options.port, protocol)
+    GameStateMachine.clients.start_sweeping()
+    reactor.run()
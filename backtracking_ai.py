@@ -1,226 +1,781 @@
+import collections
+import multiprocessing
 import time
+from fractions import Fraction
+
+import numpy as np
 
 from Minesweeper_tdd import Game, Board
 
+# Tolerance for comparing the floating point coefficients of reduced constraints
+EPSILON = 1e-9
+
+
+class SearchBudgetExceeded(Exception):
+    pass
+
+
+def add_counts(counts, branchCounts, isMine):
+    # Adds the counts of the tiles after a tile, given whether it holds a mine, to the counts from that tile on
+    for mines, (solutions, tileCounts) in branchCounts.items():
+        mines += isMine
+        tileCounts = (solutions if isMine else 0,) + tileCounts
+        if mines in counts:
+            tileCounts = tuple(map(sum, zip(counts[mines][1], tileCounts)))
+            solutions += counts[mines][0]
+        counts[mines] = (solutions, tileCounts)
+
+
+def solve_segment(numberOfTiles, constraints, maxMines, nodeBudget=None, deadline=None):
+    # Counts the consistent mine/no-mine assignments of a segment's tiles. Only plain data goes in and out,
+    # so segments can be solved in other processes.
+    #
+    # Solutions aren't kept. For every number of mines a solution can use, the counts hold how many
+    # solutions use that many mines and how many of those put a mine on each tile:
+    #     {mines: (solutions, [solutions with a mine on tile 0, tile 1, ...])}
+    # They are returned with the number of search nodes that were expanded to find them. The search gives up
+    # and returns None instead of counts once it expands nodeBudget nodes or once time.time() passes deadline.
+    #
+    # Each constraint is (tiles, mines, outside): the segment tiles around a revealed number, how many
+    # mines are still missing around it and how many undecided tiles outside the segment could hold some.
+    # Tiles are assigned in order, in place with an undo trail, and only the constraints on the tile just
+    # assigned are re-checked. How the remaining tiles can be assigned only depends on the mines assigned so
+    # far around the constraints that are still open, those with tiles on both sides of the current tile,
+    # so their counts are memoised on that. The search keeps its own stack, one frame per tile, so segments
+    # of any length can be searched without running into the recursion limit.
+    constraintsOfTile = [[] for tile in range(numberOfTiles)]
+    openConstraints = [[] for tile in range(numberOfTiles)]
+    for c, (tiles, mines, outside) in enumerate(constraints):
+        for tile in tiles:
+            constraintsOfTile[tile].append(c)
+        for tile in range(min(tiles) + 1, max(tiles) + 1) if tiles else ():
+            openConstraints[tile].append(c)
+    minesAssigned = [0] * len(constraints)
+    tilesUnassigned = [len(tiles) for tiles, mines, outside in constraints]
+    assignment = [False] * numberOfTiles
+    trail = []
+    memo = {}
+    nodes = [0]
+
+    def assign(tile, isMine):
+        trail.append(tile)
+        assignment[tile] = isMine
+        for c in constraintsOfTile[tile]:
+            tilesUnassigned[c] -= 1
+            if isMine:
+                minesAssigned[c] += 1
+
+    def undo():
+        tile = trail.pop()
+        for c in constraintsOfTile[tile]:
+            tilesUnassigned[c] += 1
+            if assignment[tile]:
+                minesAssigned[c] -= 1
+        assignment[tile] = False
+
+    def is_assignment_consistent(tile):
+        for c in constraintsOfTile[tile]:
+            tiles, mines, outside = constraints[c]
+            if minesAssigned[c] > mines or minesAssigned[c] + tilesUnassigned[c] + outside < mines:
+                return False
+        return True
+
+    def backtrack():
+        # Counts for every tile: {mines: (solutions, (solutions with a mine on each tile))}
+        # Each frame is [tile, memo key, counts for the tiles from this one on, branch being searched], and
+        # result holds the counts of the frame that was last finished.
+        stack = [[0, None, None, None]]
+        result = None
+        while stack:
+            frame = stack[-1]
+            tile, key, counts, isMine = frame
+            if counts is None:
+                if tile == numberOfTiles:
+                    result = {0: (1, ())}
+                    stack.pop()
+                    continue
+                key = (tile, tuple(minesAssigned[c] for c in openConstraints[tile]))
+                if key in memo:
+                    result = memo[key]
+                    stack.pop()
+                    continue
+                nodes[0] += 1
+                if nodeBudget is not None and nodes[0] > nodeBudget:
+                    raise SearchBudgetExceeded()
+                if deadline is not None and not nodes[0] % 256 and time.time() > deadline:
+                    raise SearchBudgetExceeded()
+                counts = {}
+                frame[1:3] = key, counts
+            else:
+                # The branch's tiles after this one were just counted
+                add_counts(counts, result, isMine)
+                undo()
+            for isMine in (True, False) if isMine is None else (False,) if isMine else ():  # With mine, then without
+                assign(tile, isMine)
+                if is_assignment_consistent(tile):
+                    frame[3] = isMine
+                    stack.append([tile + 1, None, None, None])
+                    break
+                undo()
+            else:
+                memo[key] = counts
+                result = counts
+                stack.pop()
+        return result
+
+    try:
+        counts = backtrack()
+    except SearchBudgetExceeded:
+        return None, nodes[0]
+    counts = dict((mines, (solutions, list(tileCounts)))
+                  for mines, (solutions, tileCounts) in counts.items() if mines <= maxMines)
+    return counts, nodes[0]
+
+
+def solve_segment_bitmask(numberOfTiles, constraints, maxMines, nodeBudget=None, deadline=None):
+    # The same search as solve_segment, with the assignment held in an int with a bit set for every tile that
+    # holds a mine. Each constraint becomes a bitmask of its tiles, and for every tile the bounds its constraints
+    # put on the mines among their tiles up to that one are worked out beforehand, so checking an assignment
+    # is a popcount of the mines under each mask against those bounds. Nothing needs to be undone since the
+    # assignment is passed down the search as a new int.
+    masks = [sum(1 << tile for tile in tiles) for tiles, mines, outside in constraints]
+    # (mask, fewest mines, most mines) that each constraint allows among its tiles up to this one
+    checks = [[] for tile in range(numberOfTiles)]
+    openMasks = [[] for tile in range(numberOfTiles)]
+    for mask, (tiles, mines, outside) in zip(masks, constraints):
+        for tile in tiles:
+            tilesLeft = bin(mask >> (tile + 1)).count("1")
+            checks[tile].append((mask, mines - outside - tilesLeft, mines))
+        for tile in range(min(tiles) + 1, max(tiles) + 1) if tiles else ():
+            openMasks[tile].append(mask)
+    memo = {}
+    nodes = [0]
+
+    def backtrack():
+        # Counts for every tile: {mines: (solutions, (solutions with a mine on each tile))}
+        # Each frame is [tile, assignment, memo key, counts for the tiles from this one on, branch being searched],
+        # and result holds the counts of the frame that was last finished.
+        stack = [[0, 0, None, None, None]]
+        result = None
+        while stack:
+            frame = stack[-1]
+            tile, assignment, key, counts, isMine = frame
+            if counts is None:
+                if tile == numberOfTiles:
+                    result = {0: (1, ())}
+                    stack.pop()
+                    continue
+                key = (tile, tuple(bin(assignment & mask).count("1") for mask in openMasks[tile]))
+                if key in memo:
+                    result = memo[key]
+                    stack.pop()
+                    continue
+                nodes[0] += 1
+                if nodeBudget is not None and nodes[0] > nodeBudget:
+                    raise SearchBudgetExceeded()
+                if deadline is not None and not nodes[0] % 256 and time.time() > deadline:
+                    raise SearchBudgetExceeded()
+                counts = {}
+                frame[2:4] = key, counts
+            else:
+                # The branch's tiles after this one were just counted
+                add_counts(counts, result, isMine)
+            for isMine in (True, False) if isMine is None else (False,) if isMine else ():  # With mine, then without
+                nextAssignment = assignment | (1 << tile) if isMine else assignment
+                for mask, fewest, most in checks[tile]:
+                    if not fewest <= bin(nextAssignment & mask).count("1") <= most:
+                        break
+                else:
+                    frame[4] = isMine
+                    stack.append([tile + 1, nextAssignment, None, None, None])
+                    break
+            else:
+                memo[key] = counts
+                result = counts
+                stack.pop()
+        return result
+
+    try:
+        counts = backtrack()
+    except SearchBudgetExceeded:
+        return None, nodes[0]
+    counts = dict((mines, (solutions, list(tileCounts)))
+                  for mines, (solutions, tileCounts) in counts.items() if mines <= maxMines)
+    return counts, nodes[0]
+
+
+def reduce_constraints(numberOfTiles, constraints, deadline=None):
+    # Finds the tiles of a segment that linear algebra alone proves to be mines or safe, without searching.
+    # The constraints are rows of a 0/1 matrix over the segment tiles, equal to the mines missing around each
+    # number, and are brought to reduced row echelon form by Gauss-Jordan elimination. A row, reduced or not,
+    # whose total is the sum of its positive coefficients can only be met with a mine on those tiles and none
+    # on the tiles with negative coefficients, and the other way around when its total is the negative sum.
+    #
+    # Takes constraints in solve_segment's form and returns (mine tiles, safe tiles). Raises SearchBudgetExceeded
+    # once time.time() passes deadline.
+    matrix = np.zeros((len(constraints), numberOfTiles + 1))
+    for row, (tiles, mines, outside) in enumerate(constraints):
+        if not outside:  # Mines could also be outside the segment, so this isn't an equation over its tiles
+            matrix[row, list(tiles)] = 1
+            matrix[row, -1] = mines
+    original = matrix.copy()
+
+    pivotRow = 0
+    for column in range(numberOfTiles):
+        if pivotRow == len(matrix):
+            break
+        if deadline is not None and time.time() > deadline:
+            raise SearchBudgetExceeded()
+        pivot = pivotRow + np.argmax(np.abs(matrix[pivotRow:, column]))
+        if abs(matrix[pivot, column]) < EPSILON:
+            continue
+        matrix[[pivotRow, pivot]] = matrix[[pivot, pivotRow]]
+        matrix[pivotRow] /= matrix[pivotRow, column]
+        factors = matrix[:, column].copy()
+        factors[pivotRow] = 0
+        matrix -= np.outer(factors, matrix[pivotRow])
+        pivotRow += 1
+
+    mines = np.zeros(numberOfTiles, dtype=bool)
+    safe = np.zeros(numberOfTiles, dtype=bool)
+    for row in np.vstack((original, matrix[:pivotRow])):
+        coefficients, total = row[:-1], row[-1]
+        positive = coefficients > EPSILON
+        negative = coefficients < -EPSILON
+        if not positive.any() and not negative.any():
+            continue
+        if abs(total - coefficients[positive].sum()) < EPSILON:
+            mines |= positive
+            safe |= negative
+        elif abs(total - coefficients[negative].sum()) < EPSILON:
+            mines |= negative
+            safe |= positive
+    return np.flatnonzero(mines).tolist(), np.flatnonzero(safe).tolist()
+
+
+def combine_distributions(a, b):
+    # Distribution of the total number of mines in two independent sets of tiles, from each one's {mines: ways}
+    combined = {}
+    for minesA, waysA in a.items():
+        for minesB, waysB in b.items():
+            combined[minesA + minesB] = combined.get(minesA + minesB, 0) + waysA * waysB
+    return combined
+
+
+def mine_weights(segmentCounts, numberOfOutsideTiles, minesLeft):
+    # Weighs every segment solution by the number of ways the rest of the mines fit in the tiles outside all
+    # segments, which are unconstrained, so that the global mine count is taken into account.
+    #
+    # Returns (tileWeights, outsideWeight, totalWeight): the weight of the boards with a mine on each segment
+    # tile, with a mine on any one outside tile, and of all boards. A tile's mine probability is its weight
+    # divided by the total, so a weight of 0 means it is safe and a weight equal to the total means it is a mine.
+    #
+    # Weights are exact and relative to the fewest ways the outside tiles can hold their mines, since the
+    # binomial coefficients themselves get huge on big boards.
+    distributions = [dict((mines, count[0]) for mines, count in counts.items()) for counts in segmentCounts]
+    prefixes = [{0: 1}]
+    for distribution in distributions:
+        prefixes.append(combine_distributions(prefixes[-1], distribution))
+    suffixes = [{0: 1}]
+    for distribution in reversed(distributions):
+        suffixes.append(combine_distributions(suffixes[-1], distribution))
+    suffixes.reverse()
+
+    # outsideWays[r] is proportional to the ways of placing r mines in the outside tiles
+    outsideMines = [minesLeft - mines for mines in prefixes[-1] if 0 <= minesLeft - mines <= numberOfOutsideTiles]
+    outsideWays = {}
+    if outsideMines:
+        ways = Fraction(1)
+        for r in range(min(outsideMines), max(outsideMines) + 1):
+            outsideWays[r] = ways
+            ways = ways * (numberOfOutsideTiles - r) / (r + 1)
+
+    totalWeight = 0
+    outsideWeight = 0
+    for mines, ways in prefixes[-1].items():
+        weight = ways * outsideWays.get(minesLeft - mines, 0)
+        totalWeight += weight
+        if numberOfOutsideTiles:
+            outsideWeight += weight * (minesLeft - mines) / numberOfOutsideTiles
+
+    tileWeights = []
+    for i, counts in enumerate(segmentCounts):
+        others = combine_distributions(prefixes[i], suffixes[i + 1])
+        weights = [0] * len(next(iter(counts.values()))[1]) if counts else []
+        for mines, (solutions, tileCounts) in counts.items():
+            factor = sum(ways * outsideWays.get(minesLeft - mines - otherMines, 0)
+                         for otherMines, ways in others.items())
+            if factor:
+                for tile, count in enumerate(tileCounts):
+                    weights[tile] += count * factor
+        tileWeights.append(weights)
+    return tileWeights, outsideWeight, totalWeight
+
+
+def solve_segment_job(job):
+    number, solver, arguments = job
+    return (number,) + solver(*arguments)
+
+
+# The eight rotations and reflections of the board, as (a, b, c, d) mapping (x, y) to (a*x + b*y, c*x + d*y)
+SYMMETRIES = [(1, 0, 0, 1), (0, -1, 1, 0), (-1, 0, 0, -1), (0, 1, -1, 0),
+              (-1, 0, 0, 1), (1, 0, 0, -1), (0, 1, 1, 0), (0, -1, -1, 0)]
+
+
+def segment_pattern(width, segment, numbers, constraints):
+    # Describes a segment by its shape alone, so segments that only differ by where they are on the board or by
+    # a rotation or reflection get the same key. The key lists the segment tiles and, for every number around
+    # them, its (position, mines, outside) after moving the pattern to the origin, picking whichever of the
+    # eight orientations sorts first.
+    #
+    # Returns (key, order), where order[i] is the segment tile at position i of the key.
+    tiles = [(index % width, index // width) for index in segment]
+    numberPositions = [(index % width, index // width) for index in numbers]
+    best = None
+    for a, b, c, d in SYMMETRIES:
+        transformedTiles = [(a * x + b * y, c * x + d * y) for x, y in tiles]
+        transformedNumbers = [(a * x + b * y, c * x + d * y) for x, y in numberPositions]
+        minX = min(x for x, y in transformedTiles + transformedNumbers)
+        minY = min(y for x, y in transformedTiles + transformedNumbers)
+        transformedTiles = [(x - minX, y - minY) for x, y in transformedTiles]
+        order = sorted(range(len(segment)), key=transformedTiles.__getitem__)
+        key = (tuple(transformedTiles[tile] for tile in order),
+               tuple(sorted(((x - minX, y - minY), mines, outside)
+                            for (x, y), (tiles, mines, outside) in zip(transformedNumbers, constraints))))
+        if best is None or key < best[0]:
+            best = (key, order)
+    return best
+
+
+class SegmentCache(object):
+    # Solution counts of recently solved segment patterns, dropping the least recently used once the entries hold
+    # more than capacity tile counts between them. An entry holds a count for every tile of its segment at every
+    # number of mines, so big segments weigh about the square of their size.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def entry_size(counts):
+        return sum(len(tileCounts) for solutions, tileCounts in counts.values())
+
+    def get(self, key):
+        counts = self.entries.pop(key, None)
+        if counts is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries[key] = counts
+        return counts
+
+    def put(self, key, counts):
+        size = SegmentCache.entry_size(counts)
+        if size > self.capacity:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= SegmentCache.entry_size(previous)
+        self.entries[key] = counts
+        self.size += size
+        while self.size > self.capacity:
+            oldKey, oldCounts = self.entries.popitem(last=False)
+            self.size -= SegmentCache.entry_size(oldCounts)
+
+    def __len__(self):
+        return len(self.entries)
+
 
 class BacktrackingAI(object):
-    def __init__(self, game):
+    # Segments with at least this many tiles are sent to the process pool, smaller ones aren't worth the trip
+    PARALLEL_MIN_TILES = 16
+
+    # Worker processes shared by every AI, created the first time a move needs them
+    pool = None
+
+    # Counts the solutions of a segment; solve_segment and solve_segment_bitmask give the same results and the
+    # bitmask one is faster. Any module level function with their arguments and results can be used, so that
+    # it can be sent to the pool.
+    segmentSolver = staticmethod(solve_segment_bitmask)
+
+    # Solution counts of segment patterns, shared by every AI since the same small patterns turn up in every game.
+    # Only segments up to CACHE_MAX_TILES are cached, bigger ones hardly ever turn up twice.
+    segmentCache = SegmentCache(1 << 18)
+    CACHE_MAX_TILES = 48
+
+    # Elimination takes time cubic in the size of a segment, so bigger segments are left to the search
+    MATRIX_MAX_TILES = 200
+
+    def __init__(self, game, verbose=True, processes=None, nodeBudget=None, timeLimit=None):
         self.game = game
+        self.verbose = verbose
+        # Number of worker processes to solve segments on; None uses every CPU and 1 solves them in this process
+        self.processes = processes if processes is not None else multiprocessing.cpu_count()
         self.localBoard = Board(game.board.width, game.board.height)
         # Override Tiles to have isMine be None so it can be used as a ternary field for determining
         # whether or not a space has been decided as a mine during the recursive backtracking stage
-        for row in self.localBoard.grid:
-            for tile in row:
-                tile.isMine = None
+        self.localBoard.mineGrid.fill(Board.UNDECIDED)
+        # Index of the tiles the deduction passes look at, kept up to date as tiles are revealed and flagged:
+        # revealed numbers that may still have hidden tiles around them, and hidden tiles next to a revealed one
+        self.activeNumbers = set()
+        self.frontier = set()
+        # Hidden tiles that aren't flagged
+        self.numberOfUndecidedTiles = self.localBoard.width * self.localBoard.height
+        # Limits on the search nodes a single backtracking may spend and on the seconds a whole move may take,
+        # None for no limit. Segments are solved smallest first and those left when a limit is reached are
+        # treated as unconstrained, so the move is still made but may not be the best one.
+        self.nodeBudget = nodeBudget
+        self.timeLimit = timeLimit
+        # Whether the last backtracking solved every segment, and how many didn't
+        self.isExact = True
+        self.inexactMoves = 0
+        # Search nodes expanded by every backtracking so far
+        self.backtrackingNodes = 0
+        # Times the AI had to guess
+        self.guesses = 0
+        # (mine probability, index) of the safest tile found by the last backtracking, revealed when guessing
+        self.safestTile = None
+
+    @classmethod
+    def get_pool(cls, processes):
+        if cls.pool is None:
+            cls.pool = multiprocessing.Pool(processes)
+        return cls.pool
+
+    @classmethod
+    def close_pool(cls):
+        if cls.pool is not None:
+            cls.pool.terminate()
+            cls.pool = None
+
+    def log(self, *message):
+        if self.verbose:
+            print " ".join(map(str, message))
+
+    def log_board(self):
+        if self.verbose:
+            print self.game.show_board()
+
+    def pause(self):
+        if self.verbose:
+            raw_input()
+
+    def guess(self):
+        # Only reached when no tile was revealed, so the tile least likely to be a mine is revealed.
+        # There is none when every tile left was flagged as a certain mine.
+        if self.safestTile is None:
+            return []
+        probability, index = self.safestTile
+        self.guesses += 1
+        position = self.localBoard.index_to_tile(index).position
+        self.log("The AI has to guess", position, "which is a mine with probability", float(probability))
+        return self.game.reveal(*position)
 
     def first_tile(self):
         revealedTiles = self.game.reveal(self.localBoard.width // 2, self.localBoard.height // 2)
         self.update_local_board(revealedTiles)
 
     def next_move(self):
+        deadline = time.time() + self.timeLimit if self.timeLimit is not None else None
         self.flag_obvious_mines()
-        print self.game.show_board()
+        self.log_board()
         revealedTiles = self.reveal_obvious_tiles()
-        print self.game.show_board()
-        if game.board.check_end_game_win():
+        self.log_board()
+        if self.game.board.check_end_game_win():
+            self.update_local_board(revealedTiles)
             return
         if not revealedTiles:
-            revealedTiles = self.backtracking_algorithm()
-            if not revealedTiles:
-                # If we end up here, there was no tile that is consistent across all solutions
-                print self.game.show_board()
-                revealedTiles = self.game.process_input(raw_input(
-                    game.show_prompt() + "\nThe AI has to guess\n"))
+            numberOfFlags = self.game.board.number_of_flags
+            # The border only changes when the matrix pass settles a tile, and then there's no backtracking
+            segments = self.segregate_border_tiles(sorted(self.frontier), deadline)
+            revealedTiles = self.matrix_deduction(segments, deadline)
+            if not revealedTiles and self.game.board.number_of_flags == numberOfFlags:
+                revealedTiles = self.backtracking_algorithm(segments, deadline)
+                if not revealedTiles:
+                    # If we end up here, no tile is certain to be safe or a mine
+                    revealedTiles = self.guess()
         if revealedTiles is not None:
             self.update_local_board(revealedTiles)
 
     def flag_obvious_mines(self):
-        print "Flagging obvious mines"
-        for row in self.localBoard.grid:
-            for tile in row:
-                if tile.isHidden or tile.nearbyMines == 0:
-                    continue
-                surroundingTiles = self.localBoard.surrounding_tiles(tile)
-                unrevealedSurroundingTiles = filter(lambda s: s.isHidden, surroundingTiles)
-                if len(unrevealedSurroundingTiles) == tile.nearbyMines:
-                    for s in filter(lambda s: not s.isFlagged, unrevealedSurroundingTiles):
-                        print "Marked", s.position, "as a mine"
-                        s.toggle_flag()
-                        s.set_as_mine()
-                        self.game.board.toggle_flag(*s.position)
+        self.log("Flagging obvious mines")
+        board = self.localBoard
+        for number in sorted(self.activeNumbers):
+            hiddenTiles = [s for s in board.neighbours[number] if board.hiddenGrid.item(s)]
+            if len(hiddenTiles) == board.nearbyMinesGrid.item(number):
+                for s in hiddenTiles:
+                    if not board.flaggedGrid.item(s):
+                        self.log("Marked", board.index_to_tile(s).position, "as a mine")
+                        self.mark_mine(s)
+                self.activeNumbers.discard(number)
 
     def reveal_obvious_tiles(self):
-        print "Revealing obvious tiles"
+        self.log("Revealing obvious tiles")
+        board = self.localBoard
         revealedTiles = []
-        for row in self.localBoard.grid:
-            for tile in row:
-                if not tile.isHidden and tile.nearbyMines > 0:
-                    numFlagsAround = 0
-                    numHiddenTilesAround = 0
-                    for s in self.localBoard.surrounding_tiles(tile):
-                        if s.isFlagged:
-                            numFlagsAround += 1
-                        if s.isHidden:
-                            numHiddenTilesAround += 1  # Flagged tiles are also hidden tiles
-                    # Check to see if there are hidden tiles around a number
-                    # that already has the correct number of flagged tiles
-                    if tile.nearbyMines == numFlagsAround and numHiddenTilesAround > numFlagsAround:
-                        revealed = self.game.reveal(*tile.position)
-                        revealedTiles.extend(revealed)
+        for number in sorted(self.activeNumbers):
+            numFlagsAround = 0
+            numHiddenTilesAround = 0
+            for s in board.neighbours[number]:
+                if board.flaggedGrid.item(s):
+                    numFlagsAround += 1
+                if board.hiddenGrid.item(s):
+                    numHiddenTilesAround += 1  # Flagged tiles are also hidden tiles
+            # Check to see if there are hidden tiles around a number
+            # that already has the correct number of flagged tiles
+            if board.nearbyMinesGrid.item(number) == numFlagsAround:
+                if numHiddenTilesAround > numFlagsAround:
+                    revealed = self.game.reveal(*board.index_to_tile(number).position)
+                    revealedTiles.extend(revealed)
+                self.activeNumbers.discard(number)
         return revealedTiles
 
-    def backtracking_algorithm(self):
-        BF_LIMIT = 8
-        print "Had to backtrack"
-        raw_input()
-        startTime = time.time()
-
-        borderTiles = []
-        allEmptyTiles = []
-
-        for row in self.localBoard.grid:
-            for tile in row:
-                if not tile.isFlagged:
-                    if tile.isHidden:
-                        allEmptyTiles.append(tile)
-                    if self.isBoundary(tile):
-                        borderTiles.append(tile)
-
-        numberOfUnknowableTiles = len(allEmptyTiles) - len(borderTiles)
-        borderOptimization = numberOfUnknowableTiles > BF_LIMIT
-        if not borderOptimization:
-            borderTiles = allEmptyTiles
+    def matrix_deduction(self, segments, deadline=None):
+        # Settles what the constraints of the border prove between them before resorting to a search.
+        # Segments left when the deadline passes aren't reduced.
+        self.log("Reducing the constraint matrix")
+        revealedTiles = []
+        for segment in segments:
+            if len(segment) > BacktrackingAI.MATRIX_MAX_TILES:
+                continue
+            numbers, constraints = self.segment_constraints(segment)
+            try:
+                mineTiles, safeTiles = reduce_constraints(len(segment), constraints, deadline)
+            except SearchBudgetExceeded:
+                self.log("Ran out of time reducing the constraint matrix")
+                break
+            for tile in mineTiles:
+                self.log("Marked", self.localBoard.index_to_tile(segment[tile]).position, "as a mine")
+                self.mark_mine(segment[tile])
+            for tile in safeTiles:
+                revealedTiles.extend(self.game.board.reveal(*self.localBoard.index_to_tile(segment[tile]).position))
+        return revealedTiles
 
-        print "borderOptimization", borderOptimization
+    def backtracking_algorithm(self, segments, deadline=None):
+        self.log("Had to backtrack")
+        self.pause()
+        startTime = time.time()
 
-        if not len(borderTiles):
+        if not self.numberOfUndecidedTiles:
             raise ValueError("Backtracking has no tiles to examine. Something went wrong.")
 
-        if borderOptimization:
-            borderSegments = self.segregate_border_tiles(borderTiles)
-        else:
-            borderSegments = [borderTiles]
+        # Tiles away from the border are never enumerated, the mine weights account for them all at once.
+        # The smallest segments are solved first, so a budget runs out on the ones that are least likely to finish.
+        # Border tiles that weren't segmented before the deadline are outside every segment too.
+        segments = sorted(segments, key=len)
 
         revealedTiles = []
-        print "There are", len(borderSegments), "segments"
-        # raw_input()
-        for i, segment in enumerate(borderSegments):
-            print "START BACKTRACKING ON SEGMENT", i + 1
-            segment = list(map(lambda tile: tile.position, segment))
-            solutions = []
-            self.backtrack_recursive(segment, self.localBoard.copy(), solutions, depth=0)
-            # solutions is pass-by-reference thanks to how Python's lists work
-
-            if not len(solutions):
-                raise ValueError("Backtracking couldn't find a solution. Something went wrong.")
-
-            for tilePosition in segment:
-                if self.is_tile_consistent(tilePosition, solutions):
-                    print tilePosition, "is consistent throughout all solutions"
-                    if solutions[0].convert_coordinate_to_tile(*tilePosition).isFlagged:
-                        self.localBoard.convert_coordinate_to_tile(*tilePosition).isMine = True
-                        self.localBoard.toggle_flag(*tilePosition)
-                        self.game.board.toggle_flag(*tilePosition)
-                    else:
-                        revealedTiles.extend(self.game.board.reveal(*tilePosition))
-
-        print "finished backtracking in", time.time() - startTime, "seconds"
-        print "revealed", list(map(lambda tile: tile.position, revealedTiles))
+        self.log("There are", len(segments), "segments")
+        # The global mine count ties the segments together, so every segment is counted before deciding any tile
+        segmentCounts = [None] * len(segments)
+        for i, counts, nodes in self.solve_segments(segments, deadline):
+            self.backtrackingNodes += nodes
+            if counts is None:
+                self.log("Backtracking on segment", i + 1, "ran out of budget after", nodes, "nodes")
+            else:
+                self.log("Backtracking on segment", i + 1, "found", sum(c[0] for c in counts.values()), "solutions")
+            segmentCounts[i] = counts
+
+        # Segments that weren't solved are weighed as if their tiles were unconstrained, which makes every
+        # probability an estimate, so only tiles that are decided whatever the mine count are then trusted
+        solved = [i for i, counts in enumerate(segmentCounts) if counts is not None]
+        self.isExact = len(solved) == len(segments) and sum(map(len, segments)) == len(self.frontier)
+        if not self.isExact:
+            self.log("Only", len(solved), "of", len(segments), "segments were found and solved, the move isn't exact")
+            self.inexactMoves += 1
+        numberOfOutsideTiles = self.numberOfUndecidedTiles - sum(len(segments[i]) for i in solved)
+        minesLeft = self.game.mines - self.game.board.number_of_flags
+        tileWeights, outsideWeight, totalWeight = mine_weights(
+            [segmentCounts[i] for i in solved], numberOfOutsideTiles, minesLeft)
+        if not totalWeight:
+            raise ValueError("Backtracking couldn't find a solution. Something went wrong.")
+
+        self.safestTile = None
+        if numberOfOutsideTiles:
+            solvedTiles = set(index for i in solved for index in segments[i])
+            undecidedTiles = (self.localBoard.hiddenGrid & ~self.localBoard.flaggedGrid).flat
+            outsideTiles = [index for index, isUndecided in enumerate(undecidedTiles)
+                            if isUndecided and index not in solvedTiles]
+            # The tiles outside the border share one weight, so when it's certain it decides all of them
+            if self.isExact and outsideWeight == totalWeight:
+                self.log("Every tile away from the border is a mine")
+                for index in outsideTiles:
+                    self.mark_mine(index)
+            elif self.isExact and not outsideWeight:
+                self.log("Every tile away from the border is safe")
+                for index in outsideTiles:
+                    revealedTiles.extend(self.game.board.reveal(*self.localBoard.index_to_tile(index).position))
+            else:
+                # Border tiles that weren't solved are weighed with the outside, but the weight only really holds
+                # for tiles away from the border, so one of those is guessed when there is one
+                awayTiles = [index for index in outsideTiles if index not in self.frontier]
+                self.safestTile = (outsideWeight / totalWeight, (awayTiles or outsideTiles)[0])
+        for i, weights in zip(solved, tileWeights):
+            counts = segmentCounts[i].values()
+            for tile, (index, weight) in enumerate(zip(segments[i], weights)):
+                tilePosition = self.localBoard.index_to_tile(index).position
+                if self.isExact:
+                    isMine, isSafe = weight == totalWeight, not weight
+                else:
+                    isMine = all(tileCounts[tile] == solutions for solutions, tileCounts in counts)
+                    isSafe = all(not tileCounts[tile] for solutions, tileCounts in counts)
+                if isMine:
+                    self.log(tilePosition, "is a mine in every solution")
+                    self.mark_mine(index)
+                elif isSafe:
+                    self.log(tilePosition, "is safe in every solution")
+                    revealedTiles.extend(self.game.board.reveal(*tilePosition))
+                elif self.safestTile is None or weight / totalWeight < self.safestTile[0]:
+                    self.safestTile = (weight / totalWeight, index)
+
+        self.log("finished backtracking in", time.time() - startTime, "seconds")
+        self.log("revealed", list(map(lambda tile: tile.position, revealedTiles)))
         return revealedTiles
 
-    def is_tile_consistent(self, tilePosition, solutions):
-        return all(solutions[0].convert_coordinate_to_tile(*tilePosition).isFlagged == sln for sln in
-                   map(lambda solution: solution.convert_coordinate_to_tile(*tilePosition).isFlagged, solutions[1:]))
-
-    def isBoundary(self, tile):
-        # A boundary tile is a hidden tile with revealed tiles near it.
-        if not tile.isHidden:
-            return False
-        else:
-            return any(map(lambda s: not s.isHidden, self.localBoard.surrounding_tiles(tile)))
-
-    def segregate_border_tiles(self, borderTiles):
-        allRegions = []  # List of list of tiles
-        covered = []  # List of tiles
-
-        while True:
-            queue = []  # Queue of tiles
-            region = []  # List of tiles
-
-            # Find a suitable starting point
-            for tile in borderTiles:
-                if tile not in covered:
-                    region.append(tile)
-                    covered.append(tile)
-                    queue.append(tile)
-                    break
-
-            if not queue:
+    def segregate_border_tiles(self, borderIndices, deadline=None):
+        # Splits the border into segments of tile indices that share no revealed number, so each can be solved
+        # on its own. A breadth first search from every unvisited border tile walks from tiles to the numbers
+        # around them and on to the border tiles around those, visiting every tile and number once.
+        # No more segments are started once the deadline has passed.
+        board = self.localBoard
+        unvisited = set(borderIndices)
+        visitedNumbers = set()
+        allRegions = []
+
+        for index in borderIndices:
+            if index not in unvisited:
+                continue
+            if deadline is not None and time.time() > deadline:
+                self.log("Ran out of time segmenting the border")
                 break
+            unvisited.discard(index)
+            region = [index]
+            queue = collections.deque(region)
 
             while queue:
-                currentTile = queue.pop(0)
-
-                for tile in self.localBoard.surrounding_tiles(currentTile):
-                    if tile in borderTiles and tile not in region:
-                        region.append(tile)
-                        covered.append(tile)
-                        queue.append(tile)
-                    elif tile.nearbyMines > 0:
-                        for s in filter(lambda s: s in borderTiles and s not in queue and s not in region,
-                                        self.localBoard.surrounding_tiles(tile)):
+                for number in board.neighbours[queue.popleft()]:
+                    if number in visitedNumbers or board.hiddenGrid.item(number):
+                        continue
+                    visitedNumbers.add(number)
+                    for s in board.neighbours[number]:
+                        if s in unvisited:
+                            unvisited.discard(s)
+                            region.append(s)
                             queue.append(s)
 
             allRegions.append(region)
 
         return allRegions
 
-    def backtrack_recursive(self, segment, board, solutions, depth):
-        # If the board is not consistent, return. This is the backtrack
-        if not self.is_board_consistent(board):
-            return
-
-        # If we've recursed the same number of times as their are tiles,
-        # we've found a solution.
-        if depth == len(segment):
-            # if board.number_of_flags < self.game.mines:  #TODO: and not borderOptimizaton
-            #     return
-            print "Found solution"
-            print board
-            solutions.append(board)
-            return
-
-        # Recursive step
-        markedAsMine = board.copy()
-        markedAsMine.toggle_flag(*segment[depth])
-        markedAsMine.convert_coordinate_to_tile(*segment[depth]).set_as_mine()
-        self.backtrack_recursive(segment, markedAsMine, solutions, depth=depth + 1)  # With mine
-        markedAsNotAMine = board.copy()
-        markedAsNotAMine.convert_coordinate_to_tile(*segment[depth]).isMine = False
-        self.backtrack_recursive(segment, markedAsNotAMine, solutions, depth=depth + 1)  # Without mine
-
-    def is_board_consistent(self, board):
-        for row in board.grid:
-            for tile in row:
-                if tile.isHidden:
-                    continue
-                surroundingTiles = list(board.surrounding_tiles(tile))
-
-                numberOfFlagsAroundTile = sum((s.isMine is True for s in surroundingTiles))
-                if numberOfFlagsAroundTile > tile.nearbyMines:
-                    return False
-
-                numberOfFreeSpaces = sum((s.isHidden and s.isMine is None for s in surroundingTiles))
-                if numberOfFreeSpaces < tile.nearbyMines - numberOfFlagsAroundTile:
-                    return False
-        return board.number_of_flags <= self.game.mines
+    def segment_constraints(self, segment):
+        # The revealed numbers around a segment and the constraints they place on it, in solve_segment's form
+        board = self.localBoard
+        tileOfIndex = dict((index, tile) for tile, index in enumerate(segment))
+        numbers = sorted(set(number for index in segment for number in board.neighbours[index]
+                             if not board.hiddenGrid.item(number)))
+        constraints = []
+        for number in numbers:
+            tiles = []
+            mines = board.nearbyMinesGrid.item(number)
+            outside = 0
+            for s in board.neighbours[number]:
+                value = board.mineGrid.item(s)
+                if value == 1:
+                    mines -= 1
+                elif value == Board.UNDECIDED and board.hiddenGrid.item(s):
+                    if s in tileOfIndex:
+                        tiles.append(tileOfIndex[s])
+                    else:
+                        outside += 1
+            constraints.append((tuple(tiles), mines, outside))
+        return numbers, tuple(constraints)
+
+    def solve_segments(self, segments, deadline=None):
+        # Yields (segment number, solution counts, search nodes) as each segment is solved. Segments whose
+        # pattern was solved before come from the cache. Segments share no constraints, so the big ones are
+        # solved concurrently on the process pool while the small ones are solved here.
+        #
+        # Segments that can be cached are solved without the limit on the number of mines so their counts can be
+        # reused, the limit is applied to the counts afterwards. Segments that are out of the AI's node budget or
+        # past the deadline come with None counts. Segments on the pool each get the whole budget that is left when
+        # they start.
+        maxMines = self.game.mines - self.game.board.number_of_flags
+        patterns = {}
+        jobs = []
+        for i, segment in enumerate(segments):
+            if deadline is not None and time.time() > deadline:
+                yield i, None, 0
+                continue
+            numbers, constraints = self.segment_constraints(segment)
+            if len(segment) > BacktrackingAI.CACHE_MAX_TILES:
+                jobs.append((i, (len(segment), constraints, min(len(segment), maxMines))))
+                continue
+            key, order = patterns[i] = segment_pattern(self.localBoard.width, segment, numbers, constraints)
+            cachedCounts = self.segmentCache.get(key)
+            if cachedCounts is not None:
+                counts = dict((mines, (solutions, [0] * len(segment)))
+                              for mines, (solutions, tileCounts) in cachedCounts.items() if mines <= maxMines)
+                for mines, (solutions, tileCounts) in counts.items():
+                    for position, count in enumerate(cachedCounts[mines][1]):
+                        tileCounts[order[position]] = count
+                yield i, counts, 0
+            else:
+                jobs.append((i, (len(segment), constraints, len(segment))))
+
+        def finished(i, counts, nodes):
+            if counts is not None:
+                if i in patterns:
+                    key, order = patterns[i]
+                    self.segmentCache.put(key, dict((mines, (solutions, [tileCounts[tile] for tile in order]))
+                                                    for mines, (solutions, tileCounts) in counts.items()))
+                counts = dict((mines, count) for mines, count in counts.items() if mines <= maxMines)
+            return i, counts, nodes
+
+        nodesLeft = self.nodeBudget
+        parallelJobs = [(i, self.segmentSolver, arguments + (nodesLeft, deadline)) for i, arguments in jobs
+                        if arguments[0] >= BacktrackingAI.PARALLEL_MIN_TILES]
+        if self.processes > 1 and len(parallelJobs) > 1:
+            results = self.get_pool(self.processes).imap_unordered(solve_segment_job, parallelJobs)
+            jobs = [job for job in jobs if job[1][0] < BacktrackingAI.PARALLEL_MIN_TILES]
+        else:
+            results = []
+        for i, arguments in jobs:
+            if nodesLeft is not None and nodesLeft <= 0 or deadline is not None and time.time() > deadline:
+                yield i, None, 0
+                continue
+            i, counts, nodes = solve_segment_job((i, self.segmentSolver, arguments + (nodesLeft, deadline)))
+            if nodesLeft is not None:
+                nodesLeft -= nodes
+            yield finished(i, counts, nodes)
+        for result in results:
+            yield finished(*result)
+
+    def mark_mine(self, index):
+        board = self.localBoard
+        board.set_mine(index, 1)
+        board.set_flagged(index, True)
+        self.game.board.toggle_flag(*board.index_to_tile(index).position)
+        self.frontier.discard(index)
+        self.numberOfUndecidedTiles -= 1
 
     def update_local_board(self, revealedTiles):
+        board = self.localBoard
         for tile in revealedTiles:
-            localTile = self.localBoard.convert_coordinate_to_tile(*tile.position)
-            localTile.nearbyMines = tile.nearbyMines
-            localTile.reveal()
-        self.localBoard.number_of_flags = self.game.board.number_of_flags
+            index = tile.index
+            if not board.hiddenGrid.item(index):
+                continue
+            board.set_nearby_mines(index, tile.nearbyMines)
+            board.set_hidden(index, False)
+            self.frontier.discard(index)
+            self.numberOfUndecidedTiles -= 1
+            if tile.nearbyMines:
+                self.activeNumbers.add(index)
+            for s in board.neighbours[index]:
+                if board.hiddenGrid.item(s) and not board.flaggedGrid.item(s):
+                    self.frontier.add(s)
+        board.number_of_flags = self.game.board.number_of_flags
 
 
 if __name__ == '__main__':
@@ -242,7 +797,6 @@ if __name__ == '__main__':
             tile = game.board.convert_coordinate_to_tile(*coords)
             tile.set_as_mine()
             game.board.increment_tiles_around_mine(tile)
-            game.board.minePositions.append(tile)
         game.reveal_callback = game.board.reveal
     elif size == 6:
         game.board = Board(6, 6)
@@ -251,7 +805,6 @@ if __name__ == '__main__':
             tile = game.board.convert_coordinate_to_tile(*coords)
             tile.set_as_mine()
             game.board.increment_tiles_around_mine(tile)
-            game.board.minePositions.append(tile)
         game.reveal_callback = game.board.reveal
     elif size == 7:
         game.board = Board(30, 16)
@@ -269,7 +822,6 @@ if __name__ == '__main__':
             tile = game.board.convert_coordinate_to_tile(*coords)
             tile.set_as_mine()
             game.board.increment_tiles_around_mine(tile)
-            game.board.minePositions.append(tile)
         game.reveal_callback = game.board.reveal
 
     print game.show_board()
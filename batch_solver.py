@@ -0,0 +1,120 @@
+# Plays many seeded games with the AI, without any output, and reports how well and how fast it played.
+#
+#   python batch_solver.py expert --games 1000           1000 expert games on every CPU
+#   python batch_solver.py 50x50 --mines 500 --seed 7    a custom size, starting from another seed
+import argparse
+import multiprocessing
+import random
+import sys
+from timeit import default_timer
+
+import numpy as np
+
+from Minesweeper_tdd import Game
+from backtracking_ai import BacktrackingAI
+
+__author__ = 'JacobAMason'
+
+# name, width, height, mines
+SIZES = [("beginner", 8, 8, 10),
+         ("intermediate", 16, 16, 40),
+         ("expert", 30, 16, 99)]
+
+LATENCY_PERCENTILES = [50, 90, 99]
+
+
+def play_game(job):
+    # Plays one game and returns (won, seconds taken by each move, backtracking nodes, guesses,
+    # segment cache hits, segment cache misses, inexact moves)
+    width, height, mines, seed, nodeBudget, timeLimit = job
+    cache = BacktrackingAI.segmentCache
+    hits, misses = cache.hits, cache.misses
+    random.seed(seed)
+    game = Game()
+    game.generate_board(width, height, mines)
+    # Games are already spread over the processes, so each AI solves its segments in its own process
+    ai = BacktrackingAI(game, verbose=False, processes=1, nodeBudget=nodeBudget, timeLimit=timeLimit)
+    moveTimes = []
+    start = default_timer()
+    ai.first_tile()
+    moveTimes.append(default_timer() - start)
+    while not game.board.check_end_game_win() and not game.board.check_end_game_loss():
+        start = default_timer()
+        ai.next_move()
+        moveTimes.append(default_timer() - start)
+    return (game.board.check_end_game_win(), moveTimes, ai.backtrackingNodes, ai.guesses,
+            cache.hits - hits, cache.misses - misses, ai.inexactMoves)
+
+
+def play_games(width, height, mines, games, seed, processes, nodeBudget=None, timeLimit=None):
+    jobs = [(width, height, mines, s, nodeBudget, timeLimit) for s in range(seed, seed + games)]
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            return list(pool.imap_unordered(play_game, jobs, chunksize=max(1, games // (processes * 8))))
+        finally:
+            pool.terminate()
+    return map(play_game, jobs)
+
+
+def parse_size(size, mines):
+    for name, width, height, defaultMines in SIZES:
+        if size == name:
+            return width, height, mines if mines is not None else defaultMines
+    try:
+        width, height = map(int, size.lower().split("x"))
+    except ValueError:
+        raise ValueError("Invalid size " + repr(size) + ", expected one of " +
+                         ", ".join(name for name, w, h, m in SIZES) + " or WIDTHxHEIGHT.")
+    if mines is None:
+        raise ValueError("Custom sizes need --mines.")
+    return width, height, mines
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser(description="Play seeded Minesweeper games with the AI.")
+    parser.add_argument("size", nargs="?", default="expert",
+                        help="beginner, intermediate, expert or WIDTHxHEIGHT (default: expert)")
+    parser.add_argument("--mines", type=int, help="number of mines (default: the size's own)")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play (default: 100)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, the others follow it")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(),
+                        help="worker processes to play on (default: every CPU)")
+    parser.add_argument("--node-budget", type=int, help="search nodes the AI may expand per move (default: no limit)")
+    parser.add_argument("--time-limit", type=float, help="seconds the AI may search per move (default: no limit)")
+    options = parser.parse_args(arguments)
+    if options.games < 1 or options.processes < 1:
+        parser.error("--games and --processes must be at least 1.")
+    try:
+        width, height, mines = parse_size(options.size, options.mines)
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = default_timer()
+    results = play_games(width, height, mines, options.games, options.seed, options.processes,
+                         options.node_budget, options.time_limit)
+    elapsed = default_timer() - start
+
+    won, moveTimes, nodes, guesses, cacheHits, cacheMisses, inexactMoves = zip(*results)
+    wins = sum(won)
+    moveTimes = np.concatenate(moveTimes)
+    nodes = np.array(nodes)
+    guesses = np.array(guesses)
+
+    print "%d games of %dx%d with %d mines on %d processes" % (
+        options.games, width, height, mines, options.processes)
+    print "win rate        %6.2f%%  (%d won)" % (100.0 * wins / options.games, wins)
+    print "games/sec       %10.2f" % (options.games / elapsed)
+    print "move latency   ", "  ".join("p%d %.6f s" % (p, np.percentile(moveTimes, p)) for p in LATENCY_PERCENTILES),
+    print " max %.6f s" % moveTimes.max()
+    print "nodes per game  mean %.1f  max %d  total %d" % (nodes.mean(), nodes.max(), nodes.sum())
+    print "guesses/game    %10.2f" % guesses.mean()
+    print "inexact moves   %10d" % sum(inexactMoves)
+    lookups = sum(cacheHits) + sum(cacheMisses)
+    print "segment cache   %6.2f%% hits  (%d of %d)" % (
+        100.0 * sum(cacheHits) / lookups if lookups else 0, sum(cacheHits), lookups)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
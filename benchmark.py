@@ -0,0 +1,210 @@
+# coding=utf-8
+# Times the core engine operations on fixed seeds and compares them against a stored baseline.
+#
+#   python benchmark.py                 run everything and flag regressions against the baseline
+#   python benchmark.py --save          run everything and store the results as the new baseline
+#   python benchmark.py expert.copy     only run benchmarks whose names contain one of the arguments
+import argparse
+import json
+import os
+import random
+import sys
+from timeit import default_timer
+
+import numpy as np
+
+from Minesweeper_tdd import Game, Board
+from backtracking_ai import BacktrackingAI
+
+__author__ = 'JacobAMason'
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+SEED = 1234
+
+# name, width, height, mines, operations timed together in one run
+# Every benchmark is run five times and the fastest run, divided by the batch size, is reported.
+SIZES = [("beginner", 8, 8, 10, 200),
+         ("intermediate", 16, 16, 40, 100),
+         ("expert", 30, 16, 99, 50),
+         ("huge", 1000, 1000, 150000, 1)]
+RUNS = 5
+
+# Solving a whole game is only timed on the sizes the AI can finish in reasonable time
+AI_SIZES = ["beginner", "intermediate", "expert"]
+
+
+def new_board(width, height, mines):
+    random.seed(SEED)
+    board = Board(width, height)
+    board.place_mines(mines, board.convert_coordinate_to_tile(width // 2, height // 2))
+    return board
+
+
+def first_blank_tile(board):
+    blank = ((board.nearbyMinesGrid == 0) & (board.mineGrid != 1)).nonzero()
+    return blank[1][0], blank[0][0]
+
+
+def bench_place_mines(width, height, mines):
+    board = Board(width, height)
+    centre = board.convert_coordinate_to_tile(width // 2, height // 2)
+    random.seed(SEED)
+    return lambda: board.place_mines(mines, centre)
+
+
+def bench_start_game(width, height, mines):
+    random.seed(SEED)
+    game = Game()
+    game.generate_board(width, height, mines)
+    return lambda: game.start_game(width // 2, height // 2)
+
+
+def bench_flood_reveal(width, height, mines):
+    board = new_board(width, height, mines)
+    x, y = first_blank_tile(board)
+    return lambda: board.reveal(x, y)
+
+
+def bench_chord(width, height, mines):
+    board = new_board(width, height, mines)
+    # Reveal a number next to a mine, flag its mines and chord on it
+    for index in np.flatnonzero((board.mineGrid != 1) & (board.nearbyMinesGrid > 0)):
+        neighbours = board.neighbours[index]
+        if len(neighbours) == 8:
+            break
+    y, x = divmod(int(index), width)
+    board.reveal(x, y)
+    for neighbour in neighbours:
+        if board.mineGrid.item(neighbour) == 1:
+            ny, nx = divmod(neighbour, width)
+            board.toggle_flag(nx, ny)
+    return lambda: board.reveal(x, y)
+
+
+def bench_check_end_game_win(width, height, mines):
+    board = new_board(width, height, mines)
+    return board.check_end_game_win
+
+
+def bench_copy(width, height, mines):
+    board = new_board(width, height, mines)
+    return board.copy
+
+
+def bench_render(width, height, mines):
+    board = new_board(width, height, mines)
+    board.reveal_whole_board()
+    return lambda: str(board)
+
+
+def bench_render_after_move(width, height, mines):
+    board = new_board(width, height, mines)
+    str(board)
+    return lambda: (board.toggle_flag(0, 0), str(board))
+
+
+def bench_ai_solve(width, height, mines):
+    def solve():
+        for seed in range(SEED, SEED + 5):
+            random.seed(seed)
+            game = Game()
+            game.generate_board(width, height, mines)
+            ai = BacktrackingAI(game, verbose=False)
+            ai.first_tile()
+            while not game.board.check_end_game_win() and not game.board.check_end_game_loss():
+                ai.next_move()
+    return solve
+
+
+# name, setup function; each setup returns the operation to time
+BENCHMARKS = [("place_mines", bench_place_mines),
+              ("start_game", bench_start_game),
+              ("flood_reveal", bench_flood_reveal),
+              ("chord", bench_chord),
+              ("check_end_game_win", bench_check_end_game_win),
+              ("copy", bench_copy),
+              ("render", bench_render),
+              ("render_after_move", bench_render_after_move),
+              ("ai_solve_5_games", bench_ai_solve)]
+
+
+def run(selected):
+    results = {}
+    for sizeName, width, height, mines, batch in SIZES:
+        for benchName, setup in BENCHMARKS:
+            name = sizeName + "." + benchName
+            runs = RUNS
+            if benchName.startswith("ai_solve"):
+                if sizeName not in AI_SIZES:
+                    continue
+                runs, batch = 1, 1
+            if selected and not any(s in name for s in selected):
+                continue
+            # Each run gets a fresh setup for every operation in the batch
+            best = None
+            for i in range(runs):
+                operations = [setup(width, height, mines) for j in range(batch)]
+                start = default_timer()
+                for operation in operations:
+                    operation()
+                elapsed = (default_timer() - start) / batch
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = best
+            print "%-45s %12.6f s" % (name, best)
+            sys.stdout.flush()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        ratio = results[name] / baseline[name] if baseline[name] else float("inf")
+        if ratio > tolerance:
+            regressions.append(name)
+        print "%-45s %12.6f s  baseline %12.6f s  x%.2f%s" % (
+            name, results[name], baseline[name], ratio, "  REGRESSION" if ratio > tolerance else "")
+    return regressions
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser(description="Benchmark the Minesweeper engine.")
+    parser.add_argument("benchmarks", nargs="*", help="only run benchmarks whose names contain one of these")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare against or save to")
+    parser.add_argument("--tolerance", type=float, default=2.0,
+                        help="flag a regression when a benchmark is this many times slower than the baseline")
+    options = parser.parse_args(arguments)
+
+    results = run(options.benchmarks)
+
+    if options.save:
+        baseline = {}
+        if os.path.exists(options.baseline):
+            with open(options.baseline) as f:
+                baseline = json.load(f)["results"]
+        baseline.update(results)
+        with open(options.baseline, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": baseline}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print "Saved baseline to", options.baseline
+        return 0
+
+    if not os.path.exists(options.baseline):
+        print "No baseline at", options.baseline, "- run with --save to create one"
+        return 0
+
+    with open(options.baseline) as f:
+        baseline = json.load(f)["results"]
+    print
+    regressions = compare(results, baseline, options.tolerance)
+    if regressions:
+        print
+        print len(regressions), "regression(s):", ", ".join(regressions)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
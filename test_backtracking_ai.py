@@ -0,0 +1,358 @@
+# coding=utf-8
+import itertools
+import random
+import unittest
+from fractions import Fraction
+
+from Minesweeper_tdd import Board, Game
+from backtracking_ai import (BacktrackingAI, SegmentCache, mine_weights, reduce_constraints, segment_pattern,
+                             solve_segment, solve_segment_bitmask)
+
+__author__ = 'JacobAMason'
+
+
+def wall(numbers):
+    # Constraints of a row of revealed numbers over the row of hidden tiles below it, with nothing outside
+    return tuple((tuple(tile for tile in (i - 1, i, i + 1) if 0 <= tile < len(numbers)), mines, 0)
+                 for i, mines in enumerate(numbers))
+
+
+def rigged_game(width, height, minePositions):
+    # A game with the mines where they are wanted, set up the way the scenarios at the bottom of backtracking_ai are
+    game = Game()
+    game.board = Board(width, height)
+    game.mines = len(minePositions)
+    for coords in minePositions:
+        tile = game.board.convert_coordinate_to_tile(*coords)
+        tile.set_as_mine()
+        game.board.increment_tiles_around_mine(tile)
+    game.reveal_callback = game.board.reveal
+    return game
+
+
+def play(seed, width, height, mines, **options):
+    # Plays a seeded game to the end with its own segment cache, so nothing carries over from other games
+    random.seed(seed)
+    game = Game()
+    game.generate_board(width, height, mines)
+    return play_game(game, **options)
+
+
+def play_game(game, **options):
+    ai = BacktrackingAI(game, verbose=False, **options)
+    ai.segmentCache = SegmentCache(BacktrackingAI.segmentCache.capacity)
+    ai.first_tile()
+    while not game.board.check_end_game_win() and not game.board.check_end_game_loss():
+        ai.next_move()
+    return ai, game
+
+
+class ReduceConstraintsTests(unittest.TestCase):
+    def test_one_two_one_wall(self):
+        self.assertEqual(reduce_constraints(3, wall([1, 2, 1])), ([0, 2], [1]))
+
+    def test_undetermined_tiles_are_left_alone(self):
+        self.assertEqual(reduce_constraints(2, (((0, 1), 1, 0),)), ([], []))
+
+    def test_constraints_with_tiles_outside_the_segment_are_ignored(self):
+        self.assertEqual(reduce_constraints(2, (((0, 1), 2, 1),)), ([], []))
+
+
+class SolveSegmentTests(unittest.TestCase):
+    # (number of tiles, constraints)
+    SEGMENTS = [(3, wall([1, 2, 1])),
+                (4, wall([1, 1, 1, 1])),
+                (5, wall([1, 2, 2, 1, 1])),
+                # A corner: tiles 0-2 along the top, 3-4 down the side, numbers that see tiles outside
+                (5, (((0, 1), 1, 0), ((0, 1, 2), 1, 1), ((2, 3), 1, 2), ((3, 4), 1, 0), ((4,), 0, 1))),
+                (3, (((0, 1, 2), 2, 3),))]
+
+    def test_kernels_give_the_same_counts(self):
+        for numberOfTiles, constraints in self.SEGMENTS:
+            for maxMines in range(numberOfTiles + 1):
+                self.assertEqual(solve_segment_bitmask(numberOfTiles, constraints, maxMines)[0],
+                                 solve_segment(numberOfTiles, constraints, maxMines)[0])
+
+    def test_counts_of_a_one_two_one_wall(self):
+        self.assertEqual(solve_segment_bitmask(3, wall([1, 2, 1]), 3)[0], {2: (1, [1, 0, 1])})
+
+    def test_long_segments_are_searched_without_recursing(self):
+        for solver in (solve_segment, solve_segment_bitmask):
+            counts, nodes = solver(1200, wall([1] * 1200), 1200)
+            self.assertEqual(counts, {400: (1, [1 if tile % 3 == 1 else 0 for tile in range(1200)])})
+
+    def test_search_gives_up_past_the_node_budget(self):
+        for solver in (solve_segment, solve_segment_bitmask):
+            self.assertEqual(solver(1200, wall([1] * 1200), 1200, nodeBudget=10), (None, 11))
+
+
+class MineWeightsTests(unittest.TestCase):
+    def test_probabilities_match_trying_every_board(self):
+        # One mine in two tiles, a segment of three that holds one or two mines, and four unconstrained tiles
+        segments = [(2, wall([1, 1])), (3, (((0, 1), 1, 0), ((1, 2), 1, 0)))]
+        numberOfOutsideTiles, minesLeft = 4, 3
+
+        tiles = [(s, tile) for s, (numberOfTiles, constraints) in enumerate(segments)
+                 for tile in range(numberOfTiles)] + [("outside", tile) for tile in range(numberOfOutsideTiles)]
+        boards = 0
+        boardsWithMine = dict((tile, 0) for tile in tiles)
+        for mines in itertools.combinations(tiles, minesLeft):
+            if all(sum((s, tile) in mines for tile in constraintTiles) == constraintMines
+                   for s, (numberOfTiles, constraints) in enumerate(segments)
+                   for constraintTiles, constraintMines, outside in constraints):
+                boards += 1
+                for tile in mines:
+                    boardsWithMine[tile] += 1
+
+        segmentCounts = [solve_segment(numberOfTiles, constraints, minesLeft)[0]
+                         for numberOfTiles, constraints in segments]
+        tileWeights, outsideWeight, totalWeight = mine_weights(segmentCounts, numberOfOutsideTiles, minesLeft)
+
+        for s, weights in enumerate(tileWeights):
+            for tile, weight in enumerate(weights):
+                self.assertEqual(Fraction(weight) / totalWeight, Fraction(boardsWithMine[(s, tile)], boards))
+        self.assertEqual(Fraction(outsideWeight) / totalWeight, Fraction(boardsWithMine[("outside", 0)], boards))
+
+    def test_tiles_in_every_solution_weigh_the_total(self):
+        tileWeights, outsideWeight, totalWeight = mine_weights([solve_segment(3, wall([1, 2, 1]), 5)[0]], 6, 2)
+
+        self.assertEqual(tileWeights, [[totalWeight, 0, totalWeight]])
+        self.assertEqual(outsideWeight, 0)
+
+
+class SegmentPatternTests(unittest.TestCase):
+    WIDTH = 10
+
+    # An L of tiles with numbers around it that no rotation or reflection maps onto itself,
+    # as positions and (position, mines, outside)
+    TILES = [(2, 3), (3, 3), (4, 3), (4, 4)]
+    NUMBERS = [((3, 2), 1, 0), ((5, 4), 1, 2), ((3, 4), 2, 0)]
+
+    def pattern(self, transform):
+        segment = [y * self.WIDTH + x for x, y in map(transform, self.TILES)]
+        numbers = [y * self.WIDTH + x for x, y in (transform(position) for position, mines, outside in self.NUMBERS)]
+        constraints = [((), mines, outside) for position, mines, outside in self.NUMBERS]
+        return segment_pattern(self.WIDTH, segment, numbers, constraints)
+
+    def test_moved_rotated_and_reflected_segments_share_a_pattern(self):
+        key, order = self.pattern(lambda (x, y): (x, y))
+        for transform in [lambda (x, y): (x + 3, y + 5),
+                          lambda (x, y): (9 - y, x),
+                          lambda (x, y): (9 - x, 9 - y),
+                          lambda (x, y): (9 - x, y),
+                          lambda (x, y): (y, x)]:
+            self.assertEqual(self.pattern(transform), (key, order))
+
+    def test_different_segments_have_different_patterns(self):
+        key, order = self.pattern(lambda (x, y): (x, y))
+        self.NUMBERS = [((3, 2), 1, 0), ((5, 4), 1, 1), ((3, 4), 2, 0)]
+
+        self.assertNotEqual(self.pattern(lambda (x, y): (x, y))[0], key)
+
+
+class SegmentCacheTests(unittest.TestCase):
+    def counts(self, numberOfTiles):
+        # Counts of a segment that holds one or two mines, numberOfTiles counts for each
+        return {1: (1, [0] * numberOfTiles), 2: (1, [1] * numberOfTiles)}
+
+    def test_least_recently_used_patterns_make_room(self):
+        cache = SegmentCache(10)
+        cache.put("a", self.counts(2))
+        cache.put("b", self.counts(2))
+        cache.get("a")
+        cache.put("c", self.counts(3))
+
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertEqual(cache.size, 10)
+
+    def test_replacing_a_pattern_keeps_the_size(self):
+        cache = SegmentCache(10)
+        cache.put("a", self.counts(2))
+        cache.put("a", self.counts(3))
+
+        self.assertEqual(cache.size, 6)
+        self.assertEqual(len(cache), 1)
+
+    def test_patterns_bigger_than_the_cache_are_not_kept(self):
+        cache = SegmentCache(10)
+        cache.put("a", self.counts(2))
+        cache.put("b", self.counts(6))
+
+        self.assertEqual(list(cache.entries), ["a"])
+        self.assertIsNone(cache.get("b"))
+
+    def test_big_segments_are_not_cached(self):
+        cacheMaxTiles = BacktrackingAI.CACHE_MAX_TILES
+        BacktrackingAI.CACHE_MAX_TILES = 0
+        try:
+            ai, game = play(0, 16, 16, 40)
+        finally:
+            BacktrackingAI.CACHE_MAX_TILES = cacheMaxTiles
+
+        self.assertGreater(ai.backtrackingNodes, 0)
+        self.assertEqual((len(ai.segmentCache), ai.segmentCache.hits + ai.segmentCache.misses), (0, 0))
+
+
+class BacktrackingAITests(unittest.TestCase):
+    # The 8x8 and 6x6 scenarios at the bottom of backtracking_ai
+    EIGHT_BY_EIGHT = [(7, 1), (2, 2), (0, 3), (2, 6), (3, 6), (6, 6), (1, 7), (3, 7), (4, 7), (6, 7)]
+    SIX_BY_SIX = [(2, 0), (3, 0), (0, 2), (0, 3), (5, 2), (5, 3), (2, 5), (3, 5)]
+    # Two corners that the first click leaves apart, each hiding a safe tile behind two mines
+    TWO_CORNERS = [(1, 0), (0, 1), (5, 6), (6, 5)]
+
+    def assertIndexMatchesBoard(self, ai):
+        # The frontier and the active numbers are kept up to date move by move, this works them out from scratch
+        board = ai.localBoard
+        undecided = set(index for index in range(board.width * board.height)
+                        if board.hiddenGrid.item(index) and not board.flaggedGrid.item(index))
+        revealed = set(index for index in range(board.width * board.height) if not board.hiddenGrid.item(index))
+        frontier = set(index for index in undecided if revealed.intersection(board.neighbours[index]))
+        self.assertEqual(ai.frontier, frontier)
+        self.assertEqual(ai.numberOfUndecidedTiles, len(undecided))
+        unsettledNumbers = set(index for index in revealed if undecided.intersection(board.neighbours[index]))
+        self.assertTrue(unsettledNumbers <= ai.activeNumbers <= revealed)
+
+    def play_checking_index(self, game):
+        ai = BacktrackingAI(game, verbose=False)
+        ai.segmentCache = SegmentCache(BacktrackingAI.segmentCache.capacity)
+        ai.first_tile()
+        self.assertIndexMatchesBoard(ai)
+        while not game.board.check_end_game_win() and not game.board.check_end_game_loss():
+            ai.next_move()
+            # A lost game ends on the mine that was revealed, which isn't a number
+            if not game.board.check_end_game_loss():
+                self.assertIndexMatchesBoard(ai)
+        return ai
+
+    def assertOnlyMinesFlagged(self, game):
+        board = game.board
+        for index in range(board.width * board.height):
+            if board.flaggedGrid.item(index):
+                self.assertEqual(board.mineGrid.item(index), 1)
+
+    def test_solving_boards_without_guessing(self):
+        for width, height, minePositions in [(6, 6, self.SIX_BY_SIX), (7, 7, self.TWO_CORNERS)]:
+            game = rigged_game(width, height, minePositions)
+            ai = self.play_checking_index(game)
+
+            self.assertTrue(game.board.check_end_game_win())
+            self.assertEqual(ai.guesses, 0)
+            self.assertOnlyMinesFlagged(game)
+
+    def test_solving_a_board_up_to_a_coin_toss(self):
+        # The last mine is at (3, 7) or (4, 7) with nothing to tell them apart, everything before that is deduced
+        game = rigged_game(8, 8, self.EIGHT_BY_EIGHT)
+        ai = self.play_checking_index(game)
+
+        self.assertEqual(ai.guesses, 1)
+        self.assertOnlyMinesFlagged(game)
+        self.assertEqual(game.mines - game.board.number_of_flags, 1)
+
+    def test_the_index_matches_the_board_through_random_games(self):
+        for seed in range(5):
+            random.seed(seed)
+            game = Game()
+            game.generate_board(16, 16, 40)
+            self.play_checking_index(game)
+
+    def test_borders_that_share_no_number_are_separate_segments(self):
+        ai = BacktrackingAI(rigged_game(7, 7, self.TWO_CORNERS), verbose=False)
+        ai.first_tile()
+        segments = ai.segregate_border_tiles(sorted(ai.frontier))
+
+        self.assertEqual(sorted(map(sorted, segments)), [[0, 1, 7], [41, 47, 48]])
+
+    def test_mines_away_from_the_border_are_flagged_without_guessing(self):
+        # Once the first click opens the board only the corner is left, and no number touches (0, 0)
+        ai, game = play_game(rigged_game(6, 6, [(0, 0), (1, 0), (0, 1), (1, 1)]))
+
+        self.assertTrue(game.board.check_end_game_win())
+        self.assertEqual(ai.guesses, 0)
+
+
+class GuessRecordingAI(BacktrackingAI):
+    # Remembers every guess with the frontier and the tiles away from it at the time
+    def __init__(self, *args, **kwargs):
+        BacktrackingAI.__init__(self, *args, **kwargs)
+        self.guessed = []
+
+    def guess(self):
+        if self.safestTile is not None:
+            board = self.localBoard
+            awayTiles = set(index for index in range(board.width * board.height)
+                            if board.hiddenGrid.item(index) and not board.flaggedGrid.item(index)) - self.frontier
+            self.guessed.append((self.safestTile[1], set(self.frontier), awayTiles))
+        return BacktrackingAI.guess(self)
+
+
+class SearchLimitTests(unittest.TestCase):
+    def play(self, seed, **options):
+        random.seed(seed)
+        game = Game()
+        game.generate_board(30, 16, 99)
+        ai = GuessRecordingAI(game, verbose=False, processes=1, **options)
+        ai.segmentCache = SegmentCache(BacktrackingAI.segmentCache.capacity)
+        ai.first_tile()
+        moves = []
+        while not game.board.check_end_game_win() and not game.board.check_end_game_loss():
+            guesses = ai.guesses
+            ai.next_move()
+            moves.append(ai.guesses > guesses)
+        return ai, game, moves
+
+    def assertOnlyLostOnAGuess(self, game, moves):
+        # Tiles decided without an exact count still have to be right, so a game can only be lost on a guess
+        for index in range(game.board.width * game.board.height):
+            if game.board.flaggedGrid.item(index):
+                self.assertEqual(game.board.mineGrid.item(index), 1)
+        if game.board.check_end_game_loss():
+            self.assertTrue(moves[-1])
+
+    def test_moves_are_exact_without_limits(self):
+        for seed in range(3):
+            ai, game, moves = self.play(seed)
+
+            self.assertEqual(ai.inexactMoves, 0)
+
+    def test_running_out_of_nodes_makes_moves_inexact(self):
+        for seed in range(3):
+            ai, game, moves = self.play(seed, nodeBudget=1)
+
+            self.assertGreater(ai.inexactMoves, 0)
+            self.assertOnlyLostOnAGuess(game, moves)
+
+    def test_past_the_deadline_tiles_away_from_the_border_are_guessed(self):
+        # With the deadline already gone no segment is found, so every backtracking move is inexact and guesses
+        # from the outside weight, which is only meant for tiles away from the border
+        for seed in range(3):
+            ai, game, moves = self.play(seed, timeLimit=-1)
+
+            self.assertFalse(ai.isExact)
+            self.assertEqual(ai.inexactMoves, ai.guesses)
+            self.assertOnlyLostOnAGuess(game, moves)
+            for index, frontier, awayTiles in ai.guessed:
+                self.assertIn(index, awayTiles or frontier)
+
+
+class ProcessPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.parallelMinTiles = BacktrackingAI.PARALLEL_MIN_TILES
+        BacktrackingAI.PARALLEL_MIN_TILES = 1
+
+    def tearDown(self):
+        BacktrackingAI.PARALLEL_MIN_TILES = self.parallelMinTiles
+        BacktrackingAI.close_pool()
+
+    def test_segments_solved_on_the_pool_match_solving_them_here(self):
+        for seed in range(3):
+            serialAI, serialGame = play(seed, 30, 16, 99, processes=1)
+            poolAI, poolGame = play(seed, 30, 16, 99, processes=2)
+
+            self.assertEqual(str(poolGame.board), str(serialGame.board))
+            self.assertEqual((poolAI.guesses, poolAI.backtrackingNodes),
+                             (serialAI.guesses, serialAI.backtrackingNodes))
+        self.assertIsNotNone(BacktrackingAI.pool)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+# coding=utf-8
+import random
+import unittest
+
+from twisted.internet import task
+
+from Client import (GameStateMachine, SessionStore, OutboundQueue, TARGET_LINE_BURST, SERVER_LINE_BURST,
+                    MAX_MERGED_LENGTH)
+
+__author__ = 'JacobAMason'
+
+
+class FakeSession(object):
+    def __init__(self):
+        self.isEvicted = False
+
+    def evicted(self):
+        self.isEvicted = True
+
+
+class SessionStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.store = SessionStore(maxSessions=3, idleTimeout=60, clock=self.clock.seconds)
+        self.sessions = {}
+        for user in ["a", "b", "c"]:
+            self.sessions[user] = self.store[user] = FakeSession()
+            self.clock.advance(10)
+
+    def test_sweep_closes_idle_games(self):
+        self.clock.advance(45)
+
+        self.assertEqual(self.store.sweep(), 2)
+        self.assertEqual([user for user in "abc" if user in self.store], ["c"])
+        self.assertTrue(self.sessions["a"].isEvicted)
+        self.assertTrue(self.sessions["b"].isEvicted)
+        self.assertFalse(self.sessions["c"].isEvicted)
+        self.assertEqual(self.store.evicted, 2)
+
+    def test_playing_a_game_keeps_it_open(self):
+        self.clock.advance(45)
+        self.store["a"]
+
+        self.assertEqual(self.store.sweep(), 1)
+        self.assertIn("a", self.store)
+        self.assertNotIn("b", self.store)
+
+    def test_sweep_closes_at_most_limit_games(self):
+        self.clock.advance(100)
+
+        self.assertEqual(self.store.sweep(limit=2), 2)
+        self.assertEqual(len(self.store), 1)
+        self.assertEqual(self.store.sweep(limit=2), 1)
+        self.assertEqual(self.store.evicted, 3)
+
+    def test_least_recently_played_game_makes_room(self):
+        self.store["a"]
+        self.store["d"] = FakeSession()
+
+        self.assertEqual(len(self.store), 3)
+        self.assertNotIn("b", self.store)
+        self.assertTrue(self.sessions["b"].isEvicted)
+        self.assertEqual(self.store.evicted, 1)
+
+    def test_popped_games_are_not_evicted(self):
+        self.assertIs(self.store.pop("a"), self.sessions["a"])
+        self.assertIsNone(self.store.pop("a", None))
+        self.assertRaises(KeyError, self.store.pop, "a")
+        self.assertFalse(self.sessions["a"].isEvicted)
+        self.assertEqual(self.store.evicted, 0)
+
+
+class OutboundQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.sent = []
+        self.queue = OutboundQueue(lambda target, line: self.sent.append((target, line)),
+                                   self.clock.seconds, self.clock.callLater)
+
+    def use_up_burst(self, target):
+        for i in range(TARGET_LINE_BURST):
+            self.queue.queue(target, "line %d" % i)
+        del self.sent[:]
+
+    def test_lines_are_sent_at_once_up_to_the_burst(self):
+        for i in range(TARGET_LINE_BURST + 2):
+            self.queue.queue("a", "line %d" % i)
+
+        self.assertEqual(len(self.sent), TARGET_LINE_BURST)
+        self.clock.advance(1)
+        self.assertEqual(self.sent[-1], ("a", "line %d | line %d" % (TARGET_LINE_BURST, TARGET_LINE_BURST + 1)))
+        self.assertEqual(self.queue.linesSent, TARGET_LINE_BURST + 1)
+
+    def test_waiting_lines_are_sent_at_the_target_rate(self):
+        self.use_up_burst("a")
+        self.queue.queue("a", "board 1", isBoard=True)
+        self.queue.queue("a", "board 2", isBoard=True)
+        self.queue.queue("a", "line", isBoard=False)
+
+        self.assertEqual(self.sent, [])
+        self.clock.advance(0.5)
+        self.assertEqual(self.sent, [])
+        self.clock.advance(0.5)
+        self.assertEqual(self.sent, [("a", "board 2")])
+        self.clock.advance(1)
+        self.assertEqual(self.sent, [("a", "board 2"), ("a", "line")])
+
+    def test_the_server_rate_is_shared_between_targets(self):
+        self.use_up_burst("y")
+        for i in range(SERVER_LINE_BURST - TARGET_LINE_BURST):
+            self.queue.queue("z", "line %d" % i)
+        self.assertEqual(len(self.sent), SERVER_LINE_BURST - TARGET_LINE_BURST)
+        del self.sent[:]
+
+        for target in "abc":
+            self.queue.queue(target, "%s 1\n%s 2" % (target, target), isBoard=True)
+        self.assertEqual(self.sent, [])
+        self.clock.advance(2)
+
+        # Targets take turns at the server's rate
+        self.assertEqual(self.sent, [("a", "a 1"), ("b", "b 1"), ("c", "c 1"), ("a", "a 2")])
+
+    def test_merged_lines_stay_under_the_length_limit(self):
+        self.use_up_burst("a")
+        for i in range(20):
+            self.queue.queue("a", "x" * 50)
+        self.clock.advance(3)
+
+        self.assertEqual(len(self.sent), 3)
+        self.assertTrue(all(len(line) <= MAX_MERGED_LENGTH for target, line in self.sent))
+        self.assertEqual(sum(line.count("x" * 50) for target, line in self.sent), 20)
+
+    def test_a_newer_board_replaces_one_that_was_not_started(self):
+        self.use_up_burst("a")
+        self.queue.queue("a", "old 1\nold 2", isBoard=True)
+        self.queue.queue("a", "new 1\nnew 2", isBoard=True)
+        self.clock.advance(2)
+
+        self.assertEqual(self.sent, [("a", "new 1"), ("a", "new 2")])
+        self.assertEqual(self.queue.boardsDropped, 1)
+
+    def test_a_board_being_sent_is_finished(self):
+        self.use_up_burst("a")
+        self.queue.queue("a", "old 1\nold 2", isBoard=True)
+        self.clock.advance(1)
+        self.queue.queue("a", "new 1\nnew 2", isBoard=True)
+        self.clock.advance(3)
+
+        self.assertEqual([line for target, line in self.sent], ["old 1", "old 2", "new 1", "new 2"])
+        self.assertEqual(self.queue.boardsDropped, 0)
+
+    def test_stop_cancels_the_next_pump(self):
+        self.use_up_burst("a")
+        self.queue.queue("a", "line")
+        self.queue.stop()
+        self.clock.advance(10)
+
+        self.assertEqual(self.sent, [])
+
+
+class RecordingStateMachine(GameStateMachine):
+    def __init__(self, user):
+        self.messages = []
+        self.boards = []
+        GameStateMachine.__init__(self, user)
+
+    def msg(self, message):
+        self.messages.append(message)
+
+    def msg_board(self, board):
+        self.boards.append(board)
+
+
+class BoardDeltaTests(unittest.TestCase):
+    def start(self, seed):
+        # A 10x5 board with delta updates on, before the first move
+        random.seed(seed)
+        self.machine = RecordingStateMachine("delta tester")
+        self.machine.respond("2")
+        self.machine.respond("delta")
+
+    def tearDown(self):
+        GameStateMachine.clients.pop("delta tester", None)
+
+    def test_a_reveal_sends_the_changed_tiles(self):
+        self.start(0)
+        self.machine.respond("a a")
+
+        self.assertEqual(self.machine.messages[-1], "Mines Left: 6\nChanged: a a _, b a 1, a b 1, b b 2")
+        self.assertEqual(len(self.machine.boards), 1)
+
+    def test_a_flag_sends_the_flagged_tile(self):
+        self.start(0)
+        self.machine.respond("a a")
+        self.machine.game.board.toggle_flag(2, 0)
+        self.machine.send_board()
+
+        self.assertEqual(self.machine.messages[-1], "Mines Left: 5\nChanged: c a ⚑")
+
+    def test_nothing_changed(self):
+        self.start(0)
+        self.machine.respond("a a")
+        self.machine.send_board()
+
+        self.assertEqual(self.machine.messages[-1], "Mines Left: 6\nChanged: nothing")
+
+    def test_big_changes_send_the_whole_board(self):
+        self.start(1)
+        self.machine.respond("a a")
+
+        self.assertEqual(len(self.machine.boards), 2)
+        self.assertEqual(self.machine.boards[-1], self.machine.game.show_board())
+
+    def test_sync_sends_the_whole_board(self):
+        self.start(0)
+        self.machine.respond("a a")
+        self.machine.respond("sync")
+
+        self.assertEqual(self.machine.boards[-1], self.machine.game.show_board())
+
+    def test_the_whole_board_is_sent_without_delta_updates(self):
+        self.start(0)
+        self.machine.respond("delta")
+        self.machine.respond("a a")
+
+        self.assertEqual(len(self.machine.boards), 2)
+        self.assertEqual(self.machine.boards[-1], self.machine.game.show_board())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -97,6 +97,28 @@ class Board2x3Tests(unittest.TestCase):
              [True, True]]
         )
 
+    def test_initialize_mines_avoids_every_given_tile(self):
+        self.board.place_mines(4, self.tile, self.board.grid[2][1])
+        mineGrid = [[tile.isMine for tile in row] for row in self.board.grid]
+
+        self.assertEqual(
+            mineGrid,
+            [[False, True],
+             [True, True],
+             [True, False]]
+        )
+
+    def test_initialize_too_many_mines(self):
+        self.assertRaises(ValueError, self.board.place_mines, 6, self.tile)
+
+    def test_initialize_mines_on_a_board_with_mines(self):
+        self.board.grid[0][1].set_as_mine()
+        self.board.place_mines(4, self.tile)
+
+        self.assertEqual(self.board.number_of_mines, 5)
+        self.assertEqual(self.board.minePositions, set([(1, 0), (0, 1), (1, 1), (0, 2), (1, 2)]))
+        self.assertRaises(ValueError, self.board.place_mines, 1, self.tile)
+
     def test_number_of_nearby_mines_update_when_mine_is_added(self):
         self.tile.set_as_mine()
         self.board.increment_tiles_around_mine(self.tile)
@@ -344,6 +366,132 @@ class Board2x3Tests(unittest.TestCase):
         )
 
 
+class BoardArrayTests(unittest.TestCase):
+    def setUp(self):
+        self.board = Board(width=4, height=3)
+
+    def test_tile_changes_are_stored_on_the_board(self):
+        self.board.grid[1][2].set_as_mine()
+        self.board.grid[0][3].reveal()
+
+        self.assertTrue(self.board.convert_coordinate_to_tile(2, 1).isMine)
+        self.assertFalse(self.board.convert_coordinate_to_tile(3, 0).isHidden)
+
+    def test_boards_and_tiles_have_no_instance_dict(self):
+        self.assertFalse(hasattr(self.board, "__dict__"))
+        self.assertFalse(hasattr(self.board.grid[0][0], "__dict__"))
+        self.assertFalse(hasattr(Board.Tile(0, 0), "__dict__"))
+
+    def test_tiles_at_the_same_position_are_equal(self):
+        self.assertEqual(self.board.grid[2][1], self.board.convert_coordinate_to_tile(1, 2))
+        self.assertNotEqual(self.board.grid[2][1], self.board.convert_coordinate_to_tile(2, 1))
+
+    def test_count_nearby_mines_matches_incrementing_around_each_mine(self):
+        expected = Board(width=4, height=3)
+        for x, y in [(0, 0), (2, 1), (3, 2)]:
+            self.board.convert_coordinate_to_tile(x, y).set_as_mine()
+            tile = expected.convert_coordinate_to_tile(x, y)
+            tile.set_as_mine()
+            expected.increment_tiles_around_mine(tile)
+        self.board.count_nearby_mines()
+
+        numberGrid = [[tile.nearbyMines for tile in row] for row in self.board.grid]
+        expectedGrid = [[tile.nearbyMines for tile in row] for row in expected.grid]
+        self.assertEqual(numberGrid, expectedGrid)
+
+    def test_reveal_large_open_board(self):
+        board = Board(width=400, height=300)
+        tiles = board.reveal(0, 0)
+
+        self.assertEqual(len(tiles), 400 * 300)
+        self.assertFalse(board.hiddenGrid.any())
+
+    def test_chord_reveals_each_tile_once(self):
+        mine = self.board.convert_coordinate_to_tile(0, 0)
+        mine.set_as_mine()
+        self.board.increment_tiles_around_mine(mine)
+        self.board.reveal(1, 1)
+        self.board.toggle_flag(0, 0)
+        tiles = self.board.reveal(1, 1)
+
+        self.assertEqual(len(tiles), len(set(tiles)))
+        self.assertNotIn(self.board.grid[1][1], tiles)
+        self.assertFalse(self.board.grid[2][3].isHidden)
+
+    def test_check_end_game_win_does_not_change_the_board(self):
+        self.board.check_end_game_win()
+
+        self.assertTrue(self.board.hiddenGrid.all())
+
+    def test_end_game_counters_follow_tile_changes(self):
+        mine = self.board.convert_coordinate_to_tile(3, 2)
+        mine.set_as_mine()
+        mine.toggle_flag()
+        for row in self.board.grid:
+            for tile in row:
+                if not tile.isMine:
+                    tile.reveal()
+
+        self.assertTrue(self.board.check_end_game_win())
+        mine.isMine = False
+        self.assertFalse(self.board.check_end_game_win())
+
+    def test_boards_of_the_same_size_share_neighbour_tables(self):
+        self.assertIs(Board(width=4, height=3).neighbours, self.board.neighbours)
+        self.assertEqual(sorted(self.board.neighbours[0]), [1, 4, 5])
+        self.assertEqual(len(self.board.neighbours[5]), 8)
+
+    def test_neighbour_tables_match_surrounding_indices(self):
+        for width, height in [(5, 3), (100, 50)]:
+            board = Board(width=width, height=height)
+
+            for index in range(width * height):
+                y, x = divmod(index, width)
+                self.assertEqual(tuple(board.neighbours[index]), Board.surrounding_indices(x, y, width, height))
+
+    def test_bigger_boards_keep_neighbours_in_an_array(self):
+        self.assertIsInstance(self.board.neighbours, list)
+        self.assertIsInstance(Board(width=100, height=50).neighbours, Board.NeighbourTable)
+
+    def test_only_recently_used_neighbour_tables_are_kept(self):
+        table = self.board.neighbours
+        for width in range(100, 100 + Board.NEIGHBOUR_TABLE_CACHE_SIZE):
+            Board(width=width, height=1)
+
+        self.assertEqual(len(Board.neighbourTables), Board.NEIGHBOUR_TABLE_CACHE_SIZE)
+        self.assertNotIn((4, 3), Board.neighbourTables)
+        self.assertIsNot(Board(width=4, height=3).neighbours, table)
+        self.assertEqual(sorted(self.board.neighbours[0]), [1, 4, 5])
+
+    def test_large_boards_compute_neighbours_on_demand(self):
+        board = Board(width=1000, height=1000)
+
+        self.assertEqual(sorted(board.neighbours[999]), [998, 1998, 1999])
+
+    def test_changing_a_tile_only_rerenders_its_row(self):
+        str(self.board)
+        self.board.toggle_flag(2, 1)
+
+        self.assertEqual([row is None for row in self.board.rowCache], [False, True, False])
+        self.assertEqual(self.board.inner_board_row(1), "b ████⚑ ██ b\n")
+
+    def test_copy_shares_arrays_until_written(self):
+        new = self.board.copy()
+        self.assertIs(new.hiddenGrid, self.board.hiddenGrid)
+
+        self.board.reveal(0, 0)
+        self.assertIsNot(new.hiddenGrid, self.board.hiddenGrid)
+        self.assertTrue(new.grid[0][0].isHidden)
+        self.assertIs(new.flaggedGrid, self.board.flaggedGrid)
+
+    def test_copy_does_not_share_state(self):
+        new = self.board.copy()
+        new.toggle_flag(0, 0)
+
+        self.assertTrue(new.grid[0][0].isFlagged)
+        self.assertFalse(self.board.grid[0][0].isFlagged)
+
+
 
 class GameTests(unittest.TestCase):
     def setUp(self):
@@ -405,6 +553,38 @@ class GameTests(unittest.TestCase):
         tiles = self.game.reveal(0, 0)
         self.assertItemsEqual(tiles, [tile for row in self.game.board.grid for tile in row])
 
+    def test_reveal_tile_with_numbers(self):
+        self.game.process_input("1 2")
+        visibilityGrid = [[tile.isHidden for tile in row] for row in
+                          self.game.board.grid]
+
+        self.assertEqual(
+            visibilityGrid,
+            [[True, True],
+             [False, True],
+             [True, True]]
+        )
+
+    def test_coordinates_off_the_board_are_errors(self):
+        self.game.process_input("c a")
+
+        self.assertEqual(len(self.game.errorQueue), 1)
+        self.assertEqual(self.game.reveal_callback, self.game.start_game)
+
+    def test_large_board_uses_numeric_labels(self):
+        self.game.generate_board(31, 2, 0)
+        self.game.process_input("31 2")
+
+        self.assertEqual(self.game.board.inner_board_start_row_marker(1), "2 ")
+        self.assertEqual(
+            self.game.board.column_markers(),
+            (
+                "                    1 1 1 1 1 1 1 1 1 1 2 2 2 2 2 2 2 2 2 2 3 3\n"
+                "  1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1\n"
+            )
+        )
+        self.assertTrue(self.game.board.check_end_game_win())
+
     def test_toggle_flag_mode(self):
         self.game.toggle_flag_mode()
         self.assertEqual(
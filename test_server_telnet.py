@@ -0,0 +1,182 @@
+# coding=utf-8
+import json
+import random
+import unittest
+
+from twisted.internet import error
+from twisted.python import failure
+from twisted.test import proto_helpers
+
+from Client import GameStateMachine
+from Server_telnet import TelnetServerFactory
+
+__author__ = 'JacobAMason'
+
+
+class JsonSessionTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.factory = TelnetServerFactory()
+        self.protocol = self.factory.buildProtocol(("127.0.0.1", 0))
+        self.transport = proto_helpers.StringTransport()
+        self.protocol.makeConnection(self.transport)
+        self.transport.clear()
+
+    def tearDown(self):
+        self.protocol.connectionLost(failure.Failure(error.ConnectionDone()))
+
+    def request(self, request):
+        # Sends a request and returns the response, the only line the server answers with
+        self.transport.clear()
+        self.protocol.dataReceived((request if isinstance(request, str) else json.dumps(request)) + "\r\n")
+        lines = self.transport.value().split("\r\n")
+        self.assertEqual(lines[1:], [""])
+        return json.loads(lines[0])
+
+    def board(self):
+        return GameStateMachine.clients[self.protocol.jsonUser].game.board
+
+    def test_starting_a_game(self):
+        self.assertEqual(self.request({"id": 1, "new": "intermediate"}),
+                         {"id": 1, "width": 16, "height": 16, "mines": 40, "status": "playing", "minesLeft": 40})
+
+    def test_requests_that_cannot_be_understood(self):
+        self.assertIn("error", self.request("{not json"))
+        self.assertEqual(self.request({"moves": [["reveal", 0, 0]]}), {"error": "Start a game with 'new' first."})
+        sizes = {"error": "'new' must be one of beginner, expert, intermediate."}
+        self.assertEqual(self.request({"new": "huge"}), sizes)
+        self.assertEqual(self.request({"new": {"width": 100, "height": 100, "mines": 1}}), sizes)
+
+    def test_moves_that_cannot_be_played(self):
+        self.request({"new": "beginner"})
+        response = self.request({"moves": [["reveal", 8, 0], ["jump", 1, 1], [1], ["reveal", "a", "a"]]})
+
+        self.assertEqual(response["results"], [{"error": "That tile isn't on the board."},
+                                               {"error": "The action must be 'reveal' or 'flag'."},
+                                               {"error": "A move must be [action, x, y]."},
+                                               {"error": "A move must be [action, x, y]."}])
+        self.assertEqual(self.request({"moves": "reveal"}), {"error": "'moves' must be a list of [action, x, y].",
+                                                             "status": "playing", "minesLeft": 10})
+
+    def test_a_batch_of_moves(self):
+        self.request({"new": "beginner"})
+        response = self.request({"id": 2, "moves": [["reveal", 4, 4], ["flag", 0, 0], ["flag", 1, 0],
+                                                    ["flag", 1, 0]]})
+        board = self.board()
+
+        self.assertEqual(response["id"], 2)
+        revealed = response["results"][0]["revealed"]
+        self.assertIn([4, 4, board.nearbyMinesGrid.item(4 * 8 + 4)], revealed)
+        self.assertEqual(sorted((x, y, count) for x, y, count in revealed),
+                         sorted((x, y, board.nearbyMinesGrid.item(y * 8 + x))
+                                for y in range(8) for x in range(8) if not board.hiddenGrid.item(y * 8 + x)))
+        self.assertEqual(response["results"][1:], [{"flagged": True}, {"flagged": True}, {"flagged": False}])
+        self.assertEqual((response["status"], response["minesLeft"]), ("playing", 9))
+
+    def test_revealing_a_mine_ends_the_game(self):
+        self.request({"new": "beginner"})
+        self.request({"moves": [["reveal", 4, 4]]})
+        board = self.board()
+        mine = next(index for index in range(64) if board.mineGrid.item(index) == 1)
+        response = self.request({"moves": [["reveal", mine % 8, mine // 8], ["reveal", 0, 0]]})
+
+        self.assertEqual(response["results"], [{"revealed": [], "mine": [mine % 8, mine // 8]},
+                                               {"error": "The game is over."}])
+        self.assertEqual(response["status"], "lost")
+
+    def test_winning_a_game(self):
+        self.request({"new": "beginner"})
+        self.request({"moves": [["reveal", 4, 4]]})
+        board = self.board()
+        moves = [["flag" if board.mineGrid.item(y * 8 + x) == 1 else "reveal", x, y]
+                 for y in range(8) for x in range(8)]
+        response = self.request({"moves": moves})
+
+        self.assertEqual((response["status"], response["minesLeft"]), ("won", 0))
+        self.assertEqual(self.request({"moves": [["flag", 0, 0]]})["results"], [{"error": "The game is over."}])
+
+    def test_text_games_are_kept_apart(self):
+        self.protocol.dataReceived("start\r\n")
+        self.request({"new": "beginner"})
+        self.protocol.dataReceived("1\r\n")
+
+        self.assertIn("Mines Left: 3", self.transport.value())
+        self.assertEqual(self.request({"moves": []}), {"results": [], "status": "playing", "minesLeft": 10})
+
+    def test_closing_the_connection_closes_both_games(self):
+        self.protocol.dataReceived("start\r\n")
+        self.request({"new": "beginner"})
+        self.protocol.connectionLost(failure.Failure(error.ConnectionDone()))
+
+        self.assertNotIn(self.protocol.user, GameStateMachine.clients)
+        self.assertNotIn(self.protocol.jsonUser, GameStateMachine.clients)
+        self.assertEqual(self.factory.numberOfConnections, 0)
+        self.protocol.user = None
+
+
+class TelnetServerProtocolTests(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.factory = TelnetServerFactory(maxConnections=1)
+        self.connections = []
+        self.protocol, self.transport = self.connect()
+
+    def tearDown(self):
+        for protocol, transport in self.connections:
+            protocol.connectionLost(failure.Failure(error.ConnectionDone()))
+
+    def connect(self):
+        protocol = self.factory.buildProtocol(("127.0.0.1", 0))
+        transport = proto_helpers.StringTransport()
+        protocol.makeConnection(transport)
+        self.connections.append((protocol, transport))
+        return protocol, transport
+
+    def say(self, line):
+        self.transport.clear()
+        self.protocol.dataReceived(line + "\r\n")
+        return self.transport.value()
+
+    def game(self):
+        return GameStateMachine.clients[self.protocol.user].game
+
+    def test_playing_a_text_game(self):
+        self.assertIn("Say 'start' to start a game.", self.transport.value())
+        self.assertIn("What size minefield", self.say("start"))
+        self.assertIn("Mines Left: 3\r\n", self.say("1"))
+        board = self.say("e e")
+
+        self.assertIn("Mines Left: 3\r\n", board)
+        self.assertIn("e ██1        e\r\n", board)
+        self.assertFalse(self.game().board.hiddenGrid.item(4 * 5 + 4))
+
+    def test_connections_past_the_limit_are_turned_away(self):
+        protocol, transport = self.connect()
+
+        self.assertEqual(transport.value(), "Too many people are playing, try again later.\r\n")
+        self.assertTrue(transport.disconnecting)
+        protocol.connectionLost(failure.Failure(error.ConnectionDone()))
+        self.assertEqual(self.factory.numberOfConnections, 1)
+
+        self.protocol.connectionLost(failure.Failure(error.ConnectionDone()))
+        self.assertEqual(self.factory.numberOfConnections, 0)
+        self.connections = []
+        protocol, transport = self.connect()
+        self.assertIn("Say 'start' to start a game.", transport.value())
+        self.assertEqual(self.factory.numberOfConnections, 1)
+
+    def test_output_waits_while_the_client_is_not_reading(self):
+        self.assertIs(self.transport.producer, self.protocol)
+        self.protocol.pauseProducing()
+
+        self.assertEqual(self.say("help\r\nstart"), "")
+        self.protocol.resumeProducing()
+        output = self.transport.value()
+        # Both lines are handled once the client reads again, in the order they came
+        self.assertTrue(output.startswith("Say 'start' to start a game.\r\nWhile playing"))
+        self.assertIn("What size minefield", output)
+        self.assertIn(self.protocol.user, GameStateMachine.clients)
+
+
+if __name__ == '__main__':
+    unittest.main()